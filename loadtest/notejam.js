@@ -0,0 +1,115 @@
+// Notejam load test (k6): signin, note list and note create / delete scenarios.
+//
+// Thresholds fail the run (exit code 99) when the latency or the error rate is over budget:
+//   P95_MS, P99_MS (http_req_duration) and ERROR_RATE (http_req_failed), VUS and DURATION size the load.
+// EMAIL and PASSWORD are the load test user (signed up on the first run), in the pipeline they come from
+// the load test secret. Every note created is deleted again, leftovers of an interrupted run in the teardown.
+//
+// Locally, against the docker-compose stack of the app:
+//   docker run --rm -i --network host -e BASE_URL=http://localhost:3000 -e PASSWORD=<password> \
+//     grafana/k6:0.33.0 run - < loadtest/notejam.js
+
+import http from 'k6/http';
+import { check, sleep } from 'k6';
+
+const BASE_URL = __ENV.BASE_URL || 'http://localhost:3000';
+const VUS = parseInt(__ENV.VUS || '5');
+const DURATION = __ENV.DURATION || '1m';
+const EMAIL = __ENV.EMAIL || 'loadtest@notejam.invalid';
+const PASSWORD = __ENV.PASSWORD;
+const NOTE_NAME = 'Load test';
+
+if (!PASSWORD) {
+  throw new Error('PASSWORD is required');
+}
+
+export const options = {
+  scenarios: {
+    signin: {
+      executor: 'constant-vus',
+      exec: 'signin',
+      vus: Math.max(1, Math.floor(VUS / 5)),
+      duration: DURATION,
+    },
+    notes: {
+      executor: 'constant-vus',
+      exec: 'notes',
+      vus: VUS,
+      duration: DURATION,
+    },
+  },
+  thresholds: {
+    http_req_duration: [`p(95)<${__ENV.P95_MS || 500}`, `p(99)<${__ENV.P99_MS || 1500}`],
+    http_req_failed: [`rate<${__ENV.ERROR_RATE || 0.01}`],
+    checks: [`rate>${1 - (__ENV.ERROR_RATE || 0.01)}`],
+  },
+};
+
+// the load test user is created once, signup fails harmlessly when it already exists
+export function setup() {
+  http.post(`${BASE_URL}/signup`, { email: EMAIL, password: PASSWORD, repeat_password: PASSWORD },
+    { tags: { name: 'signup' }, responseCallback: http.expectedStatuses({ min: 200, max: 499 }) });
+}
+
+function login(jar) {
+  const response = http.post(`${BASE_URL}/signin`, { email: EMAIL, password: PASSWORD },
+    { tags: { name: 'signin' }, jar: jar });
+  check(response, { 'signed in': (r) => r.status === 200 && r.url.indexOf('/signin') === -1 });
+}
+
+// ids of the notes of the note list page named `name` (or starting with it, with `prefix`)
+function noteIds(page, name, prefix) {
+  const escaped = name.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+  const link = new RegExp(`href="/notes/(\\d+)"[^>]*>\\s*${escaped}${prefix ? '' : '\\s*<'}`, 'g');
+  const ids = [];
+  let match;
+  while ((match = link.exec(page.body || '')) !== null) {
+    ids.push(match[1]);
+  }
+  return ids;
+}
+
+// with the default cookie jar of the VU unless another one is given
+function deleteNote(id, jar) {
+  return http.post(`${BASE_URL}/notes/${id}/delete`, {},
+    { tags: { name: 'note delete' }, jar: jar || http.cookieJar() });
+}
+
+// a new session on every iteration
+export function signin() {
+  login(new http.CookieJar());
+  sleep(1);
+}
+
+export function notes() {
+  // one session per VU (default cookie jar)
+  if (__ITER === 0) {
+    login(http.cookieJar());
+  }
+
+  const list = http.get(`${BASE_URL}/`, { tags: { name: 'note list' } });
+  check(list, { 'note list': (r) => r.status === 200 });
+  sleep(1);
+
+  // redirects to the note list
+  const name = `${NOTE_NAME} ${__VU}-${__ITER}`;
+  const create = http.post(`${BASE_URL}/notes/create`,
+    { name: name, text: 'Created by the load test', pad: '' },
+    { tags: { name: 'note create' } });
+  check(create, { 'note created': (r) => r.status === 200 });
+  sleep(1);
+
+  const [id] = noteIds(create, name, false);
+  if (id !== undefined) {
+    check(deleteNote(id), { 'note deleted': (r) => r.status === 200 });
+  }
+  sleep(1);
+}
+
+// notes left over by failed deletes or an interrupted run
+export function teardown() {
+  const jar = new http.CookieJar();
+  login(jar);
+  const list = http.get(`${BASE_URL}/`, { tags: { name: 'note list' }, jar: jar });
+  noteIds(list, NOTE_NAME, true).forEach((id) => deleteNote(id, jar));
+}
@@ -0,0 +1,576 @@
+import json
+import os
+from pathlib import Path
+from typing import NamedTuple, Mapping
+
+from aws_cdk.aws_codebuild import BuildSpec, BuildEnvironment, BuildEnvironmentVariable, PipelineProject, LinuxBuildImage, \
+    Cache, LocalCacheMode
+from aws_cdk.aws_codepipeline import Artifact, Pipeline
+from aws_cdk.aws_codepipeline_actions import GitHubSourceAction, GitHubTrigger, CodeBuildAction, EcsDeployAction
+from aws_cdk.aws_ec2 import IVpc, ISecurityGroup, SubnetSelection
+from aws_cdk.aws_ecr import IRepository
+from aws_cdk.aws_ecs import IBaseService
+from aws_cdk.aws_iam import ManagedPolicy, PolicyStatement
+from aws_cdk.aws_logs import RetentionDays
+from aws_cdk.aws_secretsmanager import ISecret, Secret, SecretStringGenerator
+from aws_cdk.core import Construct, SecretValue, Duration, Stack, RemovalPolicy
+
+from notejam.pipeline_metrics import PipelineMetrics
+from notejam.settings import settings_from_env
+from notejam.testing import MOCHA_SHARD_SCRIPT
+from notejam.tracing import COLLECTOR_LOCAL_CONFIG
+
+LOAD_TEST_SCRIPT = Path(__file__).parent.parent / "loadtest" / "notejam.js"
+
+
+class LoadTestSettings(NamedTuple):
+    """Load and SLO of the LoadTest stage, each overridable by LOAD_TEST_<FIELD> (e.g. LOAD_TEST_P95_MS)."""
+
+    enabled: bool = False
+    vus: int = 5
+    duration: str = "1m"
+    p95_ms: int = 500
+    p99_ms: int = 1500
+    error_rate: float = 0.01
+    rollback: bool = True
+
+
+def load_test_settings_from_env(environ: Mapping[str, str] = os.environ) -> LoadTestSettings:
+    return settings_from_env(LoadTestSettings(), "LOAD_TEST_", environ)
+
+
+class AppPipeline(Construct):
+    """CI/CD Pipeline for the Notejam App: Source, Build (+ Test & DbMigrations), Deploy (to Fargate) and LoadTest.
+
+    Test and DbMigrations run next to the image build and start on the image as soon as it is in ECR,
+    Deploy waits for all three. Every action and pipeline execution duration is published as a metric.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 env: str,
+                 github_owner: str,
+                 github_repo_app: str,
+                 ecr_repo: IRepository,
+                 service: IBaseService,
+                 vpc: IVpc,
+                 security_group: ISecurityGroup,
+                 db_secret: ISecret,
+                 docker_platforms: str,
+                 test_shards: int,
+                 soci_index: bool = False,
+                 tracing_collector_image: str = None,
+                 load_balancer_dns_name: str = None,
+                 load_test: LoadTestSettings = LoadTestSettings(),
+                 log_retention: RetentionDays = RetentionDays.ONE_MONTH) -> None:
+        super().__init__(scope, construct_id)
+
+        region = Stack.of(self).region
+
+        pipeline = Pipeline(
+            self, "CodePipeline",
+        )
+
+        # ==========================================================================================
+        # Source Stage - CodePipeline
+
+        source_output = Artifact()
+        source_action = GitHubSourceAction(
+            oauth_token=SecretValue.secrets_manager("notejam", json_field="gitHubToken"),
+            output=source_output,
+            owner=github_owner,
+            repo=github_repo_app,
+            # TODO: Use different branch names for different environments
+            branch="main" if env == "prod" else "main",
+            trigger=GitHubTrigger.WEBHOOK,
+            action_name="GitHub-Source",
+        )
+
+        pipeline.add_stage(
+            stage_name="Source",
+            actions=[source_action]
+        )
+
+        # ==========================================================================================
+        # Build Stage - CodePipeline
+
+        # with the load test rollback, latest (the image of the task definition registered by CDK) is moved by
+        # the LoadTest stage once the image passed, so that rolling back to a CDK revision runs the previous image
+        load_test_rollback = load_test.enabled and load_test.rollback
+        latest_tag_option = "" if load_test_rollback else "-t $DOCKER_LATEST "
+
+        build_commands = [
+            f"export DOCKER_TAG={env}-$(echo $CODEBUILD_RESOLVED_SOURCE_VERSION | cut -c -8)",
+            f"export DOCKER_IMG={ecr_repo.repository_uri}:$DOCKER_TAG",
+            f"export DOCKER_LATEST={ecr_repo.repository_uri}:latest",
+            f"export DOCKER_CACHE={ecr_repo.repository_uri}:cache-{env}",
+            f"aws ecr get-login-password --region {region} | docker login --username AWS --password-stdin {ecr_repo.repository_uri}",
+            f"docker buildx build --platform {docker_platforms} --push -t $DOCKER_IMG {latest_tag_option}"
+            "--cache-from type=registry,ref=$DOCKER_CACHE "
+            "--cache-to type=registry,ref=$DOCKER_CACHE,mode=max,image-manifest=true,oci-mediatypes=true "
+            "-f ./docker/ecs/Dockerfile . ",
+            'echo \'[{"name":"notejam","imageUri":"\'$DOCKER_IMG\'"}]\' > imagedefinitions.json'
+        ]
+
+        # SOCI (seekable OCI) index pushed next to the image, so that Fargate lazy-loads it instead of
+        # pulling every layer before starting the container. soci works on the containerd image store,
+        # which is the one started by dockerd in CodeBuild.
+        if soci_index:
+            build_commands[-1:-1] = [
+                "export CONTAINERD_ADDRESS=/var/run/docker/containerd/containerd.sock",
+                f"export ECR_PASSWORD=$(aws ecr get-login-password --region {region})",
+                f"for platform in $(echo {docker_platforms} | tr ',' ' '); do "
+                "ctr --address $CONTAINERD_ADDRESS images pull --user AWS:$ECR_PASSWORD --platform $platform $DOCKER_IMG "
+                "&& soci --address $CONTAINERD_ADDRESS create --platform $platform $DOCKER_IMG "
+                "&& soci --address $CONTAINERD_ADDRESS push --user AWS:$ECR_PASSWORD --platform $platform $DOCKER_IMG "
+                "|| exit 1; done",
+            ]
+
+        # buildx builds the docker_platforms image (a multi-arch manifest when several), arm64/Graviton under
+        # QEMU emulation on the amd64 build host, which is much slower.
+        # Layers are cached in ECR (cache-<env> tag, not expired by the lifecycle rule): the docker-container
+        # builder keeps its own BuildKit state, which the CodeBuild docker layer cache doesn't see. The buildx
+        # plugin is kept in the CodeBuild local (custom) cache.
+        emulated_build = docker_platforms.split(",") != ["linux/amd64"]
+        build_install_commands = [
+            "mkdir -p ~/.docker/cli-plugins",
+            "test -x ~/.docker/cli-plugins/docker-buildx || curl -sSL -o ~/.docker/cli-plugins/docker-buildx "
+            "https://github.com/docker/buildx/releases/download/v0.12.1/buildx-v0.12.1.linux-amd64",
+            "chmod +x ~/.docker/cli-plugins/docker-buildx",
+            *(["docker run --privileged --rm tonistiigi/binfmt --install arm64"] if emulated_build else []),
+            "docker buildx create --use --name notejam",
+        ]
+        if soci_index:
+            build_install_commands += [
+                "mkdir -p ~/.soci/bin",
+                "test -x ~/.soci/bin/soci || curl -sSL "
+                "https://github.com/awslabs/soci-snapshotter/releases/download/v0.4.1/soci-snapshotter-0.4.1-linux-amd64.tar.gz "
+                "| tar xz -C ~/.soci/bin soci",
+                "cp ~/.soci/bin/soci /usr/local/bin/soci",
+            ]
+
+        build_proj = PipelineProject(
+            self, "NotejamApp",
+            environment=BuildEnvironment(
+                build_image=LinuxBuildImage.STANDARD_5_0,
+                privileged=True
+            ),
+            timeout=Duration.minutes(20 if emulated_build else 10),
+            cache=Cache.local(LocalCacheMode.CUSTOM),
+            build_spec=BuildSpec.from_object({
+                "version": "0.2",
+                "run-as": "root",
+                "env": {
+                    "variables": {
+                        "DOCKER_BUILDKIT": "1"
+                    }
+                },
+                "phases": {
+                    "install": {
+                        "commands": build_install_commands
+                    },
+                    "build": {
+                        "commands": build_commands
+                    }
+                },
+                "artifacts": {
+                    "name": "image-definistions.zip",
+                    "files": [
+                        "imagedefinitions.json"
+                    ]
+                },
+                "cache": {
+                    "paths": [
+                        "/root/.docker/cli-plugins/**/*",
+                        "/root/.soci/bin/**/*"
+                    ]
+                },
+            })
+        )
+        build_proj.role.add_managed_policy(
+            ManagedPolicy.from_aws_managed_policy_name("AmazonEC2ContainerRegistryPowerUser")
+        )
+        build_proj.role.add_managed_policy(
+            ManagedPolicy.from_aws_managed_policy_name("AmazonElasticContainerRegistryPublicReadOnly")
+        )
+
+        # tags the builds of the Build action with their pipeline execution (see wait_for_image_commands)
+        pipeline_execution_environment = {
+            "PIPELINE_EXECUTION_ID": BuildEnvironmentVariable(value="#{codepipeline.PipelineExecutionId}")
+        }
+
+        build_output = Artifact()
+        build_action = CodeBuildAction(
+            action_name="Build",
+            project=build_proj,
+            input=source_output,
+            outputs=[build_output],
+            environment_variables=pipeline_execution_environment
+        )
+
+        # Test & DbMigrations poll ECR for the image of this commit, instead of waiting for the whole Build action,
+        # and give up as soon as the (latest) Build of the same pipeline execution failed. The Build project is
+        # checked rather than the pipeline, which would make the projects depend on the pipeline that uses them.
+        wait_for_image_commands = [
+            f"export DOCKER_TAG={env}-$(echo $CODEBUILD_RESOLVED_SOURCE_VERSION | cut -c -8)",
+            "for i in $(seq 1 120); do "
+            f"aws ecr describe-images --repository-name {ecr_repo.repository_name} --image-ids imageTag=$DOCKER_TAG "
+            "> /dev/null 2>&1 && break; "
+            "[ $i -eq 120 ] && echo \"$DOCKER_TAG not pushed\" && exit 1; sleep 10; "
+            "BUILD_STATUS=$(aws codebuild batch-get-builds --ids $(aws codebuild list-builds-for-project "
+            f"--project-name {build_proj.project_name} --no-paginate --query 'ids[:10]' --output text) "
+            "--query \"sort_by(builds[?environment.environmentVariables[?name=='PIPELINE_EXECUTION_ID' "
+            "&& value=='$PIPELINE_EXECUTION_ID']], &startTime)[-1].buildStatus\" --output text); "
+            "case $BUILD_STATUS in FAILED|FAULT|TIMED_OUT|STOPPED) "
+            "echo \"Build $BUILD_STATUS, $DOCKER_TAG not pushed\" && exit 1;; esac; done",
+        ]
+        wait_for_image_policy = PolicyStatement(
+            actions=["codebuild:ListBuildsForProject", "codebuild:BatchGetBuilds"],
+            resources=[build_proj.project_arn]
+        )
+
+        # ==========================================================================================
+        # Build Stage - Test
+
+        # Runs the image pushed by Build with plain `docker run` (the compose service bind-mounts the checkout,
+        # which would hide the node_modules of the image), next to the compose dependencies (database) and with
+        # the environment compose gives to the app. Each batch shard runs every TEST_SHARDS-th spec file of
+        # the `npm test` script (see notejam/testing/mocha-shard.js) and writes a JUnit report.
+        test_commands = [
+            *wait_for_image_commands,
+            f"export DOCKER_IMG={ecr_repo.repository_uri}:$DOCKER_TAG",
+            f"aws ecr get-login-password --region {region} | docker login --username AWS --password-stdin {ecr_repo.repository_uri}",
+            "docker pull $DOCKER_IMG",
+            # so that compose uses the pulled image instead of building one
+            "docker tag $DOCKER_IMG ${COMPOSE_PROJECT_NAME}_notejam",
+            "mkdir -p reports",
+            "docker-compose up -d $(docker-compose config --services | grep -vx notejam)",
+            "docker-compose run --rm --no-deps -T --entrypoint env notejam | sort > compose.env",
+            "docker run --rm --entrypoint env $DOCKER_IMG | sort > image.env",
+            "comm -13 image.env compose.env | grep -v '^HOSTNAME=' > test.env",
+            "printenv MOCHA_SHARD_SCRIPT > mocha-shard.js",
+            "export TEST_RUN=\"docker run --rm --network ${COMPOSE_PROJECT_NAME}_default --env-file test.env "
+            "-e NODE_ENV=test\"",
+            # wait until the database accepts connections instead of a fixed sleep
+            "for i in $(seq 1 30); do "
+            "$TEST_RUN $DOCKER_IMG npm run init-db -- --create-test-db && break; "
+            "[ $i -eq 30 ] && exit 1; sleep 2; done",
+            "export MOCHA_ARGS=$($TEST_RUN -e TEST_SHARDS -e TEST_SHARD -v $PWD/mocha-shard.js:/tmp/mocha-shard.js "
+            "$DOCKER_IMG node /tmp/mocha-shard.js)",
+            "echo \"Shard $TEST_SHARD/$TEST_SHARDS: $MOCHA_ARGS\"",
+        ]
+        test_run_options = "-v $PWD/reports:/reports"
+        test_post_build_commands = []
+
+        # The same collector as in the Fargate task, printing the spans instead of sending them to X-Ray
+        if tracing_collector_image:
+            test_commands.append(
+                "docker run -d --name otel-collector --network ${COMPOSE_PROJECT_NAME}_default "
+                f"-e AOT_CONFIG_CONTENT {tracing_collector_image}"
+            )
+            test_run_options += (" -e OTEL_SERVICE_NAME=notejam-test"
+                                 " -e OTEL_EXPORTER_OTLP_ENDPOINT=http://otel-collector:4317"
+                                 " -e OTEL_PROPAGATORS=xray,tracecontext"
+                                 " -e AWS_XRAY_DAEMON_ADDRESS=otel-collector:2000")
+            test_post_build_commands = [
+                "docker logs otel-collector > reports/traces-$TEST_SHARD.log 2>&1 || true",
+                "echo \"Spans collected: $(grep -c 'Span #' reports/traces-$TEST_SHARD.log)\"",
+            ]
+
+        # a shard without spec files is skipped (mocha without files would run the default spec, i.e. everything)
+        test_commands.append(
+            "if [ -z \"$MOCHA_ARGS\" ]; then echo \"No spec files for shard $TEST_SHARD\"; else "
+            f"$TEST_RUN {test_run_options} $DOCKER_IMG npx mocha --exit $MOCHA_ARGS "
+            "--reporter xunit --reporter-options output=/reports/junit-$TEST_SHARD.xml; fi"
+        )
+
+        test_proj = PipelineProject(
+            self, "Test",
+            environment=BuildEnvironment(
+                build_image=LinuxBuildImage.STANDARD_5_0,
+                privileged=True
+            ),
+            # includes the wait for the image (up to 20 min)
+            timeout=Duration.minutes(30),
+            build_spec=BuildSpec.from_object({
+                "version": "0.2",
+                "run-as": "root",
+                "env": {
+                    "variables": {
+                        "COMPOSE_PROJECT_NAME": "notejam",
+                        "TEST_SHARDS": str(test_shards),
+                        "TEST_SHARD": "0",
+                        "MOCHA_SHARD_SCRIPT": MOCHA_SHARD_SCRIPT,
+                        **({"AOT_CONFIG_CONTENT": COLLECTOR_LOCAL_CONFIG} if tracing_collector_image else {})
+                    }
+                },
+                "batch": {
+                    "fast-fail": False,
+                    "build-list": [
+                        {
+                            "identifier": f"shard_{shard}",
+                            "env": {
+                                "variables": {
+                                    "TEST_SHARD": str(shard)
+                                }
+                            }
+                        } for shard in range(test_shards)
+                    ]
+                },
+                "phases": {
+                    "build": {
+                        "commands": test_commands
+                    },
+                    **({"post_build": {"commands": test_post_build_commands}} if test_post_build_commands else {})
+                },
+                "reports": {
+                    "notejam-tests": {
+                        "files": ["reports/*.xml"],
+                        "file-format": "JUNITXML"
+                    }
+                }
+            })
+        )
+        test_proj.enable_batch_builds()
+        test_proj.role.add_managed_policy(
+            ManagedPolicy.from_aws_managed_policy_name("AmazonEC2ContainerRegistryReadOnly")
+        )
+        test_proj.add_to_role_policy(wait_for_image_policy)
+
+        test_action = CodeBuildAction(
+            action_name="Test",
+            project=test_proj,
+            input=source_output,
+            environment_variables=pipeline_execution_environment,
+            execute_batch_build=True
+        )
+
+        # ==========================================================================================
+        # Build Stage - DB Migrations
+
+        # Runs before the tests are done: migrations must stay compatible with the running version
+        # (as for the rolling deployment)
+        db_migration_commands = [
+            *wait_for_image_commands,
+            f"aws ecr get-login-password --region {region} | docker login --username AWS --password-stdin {ecr_repo.repository_uri}",
+            f"export DOCKER_IMG={ecr_repo.repository_uri}:$DOCKER_TAG",
+            f"export SECRET=$(aws secretsmanager get-secret-value --secret-id {db_secret.secret_name} --output text --query 'SecretString')",
+            "echo DB_HOST=$(echo $SECRET | jq -r '.host') > docker.env",
+            "echo DB_NAME=$(echo $SECRET | jq -r '.dbname') >> docker.env",
+            "echo DB_USERNAME=$(echo $SECRET | jq -r '.username') >> docker.env",
+            "echo DB_PASSWORD=$(echo $SECRET | jq -r '.password') >> docker.env",
+            "docker run --rm --env-file docker.env $DOCKER_IMG npm run init-db",
+        ]
+
+        db_migrations_proj = PipelineProject(
+            self, "DbMigrations",
+            environment=BuildEnvironment(
+                build_image=LinuxBuildImage.STANDARD_5_0,
+                privileged=True
+            ),
+            vpc=vpc,
+            subnet_selection=SubnetSelection(subnet_group_name="Persistence"),
+            security_groups=[security_group],
+            # includes the wait for the image (up to 20 min)
+            timeout=Duration.minutes(30),
+            build_spec=BuildSpec.from_object({
+                "version": "0.2",
+                "run-as": "root",
+                "phases": {
+                    "build": {
+                        "commands": db_migration_commands
+                    }
+                }
+            })
+        )
+        db_migrations_proj.role.add_managed_policy(
+            ManagedPolicy.from_aws_managed_policy_name("AmazonEC2ContainerRegistryReadOnly")
+        )
+        db_migrations_proj.add_to_role_policy(wait_for_image_policy)
+        db_secret.grant_read(db_migrations_proj.role)
+
+        db_migrations_action = CodeBuildAction(
+            action_name="DbMigrations",
+            project=db_migrations_proj,
+            input=source_output,
+            environment_variables=pipeline_execution_environment
+        )
+
+        pipeline.add_stage(
+            stage_name="Build",
+            actions=[build_action, test_action, db_migrations_action]
+        )
+
+        # ==========================================================================================
+        # Deploy Stage - CodePipeline
+
+        deploy_actions = [
+            EcsDeployAction(
+                action_name="DeployAction",
+                service=service,
+                input=build_output,
+                deployment_timeout=Duration.minutes(10),
+                run_order=2
+            )
+        ]
+
+        # records the task definition the service runs before the deployment, for the load test rollback
+        # (the previous revision number can be one that never ran, or a CDK one on the moved latest)
+        if load_test_rollback:
+            pre_deploy_proj = PipelineProject(
+                self, "PreDeploy",
+                environment=BuildEnvironment(
+                    build_image=LinuxBuildImage.STANDARD_5_0
+                ),
+                timeout=Duration.minutes(5),
+                build_spec=BuildSpec.from_object({
+                    "version": "0.2",
+                    "env": {
+                        "exported-variables": ["TASK_DEFINITION"]
+                    },
+                    "phases": {
+                        "build": {
+                            "commands": [
+                                "export TASK_DEFINITION=$(aws ecs describe-services "
+                                f"--cluster {service.cluster.cluster_name} --services {service.service_name} "
+                                "--query 'services[0].taskDefinition' --output text)",
+                                "echo \"Deploying over $TASK_DEFINITION\"",
+                            ]
+                        }
+                    }
+                })
+            )
+            pre_deploy_proj.add_to_role_policy(PolicyStatement(
+                actions=["ecs:DescribeServices"],
+                resources=[service.service_arn]
+            ))
+            pre_deploy_action = CodeBuildAction(
+                action_name="PreDeploy",
+                project=pre_deploy_proj,
+                input=source_output,
+                variables_namespace="PreDeploy",
+                run_order=1
+            )
+            deploy_actions.insert(0, pre_deploy_action)
+
+        pipeline.add_stage(
+            stage_name="Deploy",
+            actions=deploy_actions
+        )
+
+        # ==========================================================================================
+        # Load Test Stage - CodePipeline
+
+        # k6 against the ALB (CloudFront would hide the origin latency), as the load test user of the secret:
+        # the thresholds fail the build, and the service goes back to the task definition it ran before the deployment
+        if load_test.enabled:
+            load_test_user = Secret(
+                self, "LoadTestUser",
+                description=f"Notejam {env} load test user",
+                generate_secret_string=SecretStringGenerator(
+                    secret_string_template=json.dumps({"email": f"loadtest-{env}@notejam.invalid"}),
+                    generate_string_key="password",
+                    exclude_punctuation=True
+                ),
+                # the first run signs the user up with this password
+                removal_policy=RemovalPolicy.RETAIN
+            )
+
+            load_test_commands = [
+                "printenv LOAD_TEST_SCRIPT | docker run --rm -i "
+                "-e BASE_URL -e VUS -e DURATION -e P95_MS -e P99_MS -e ERROR_RATE -e EMAIL -e PASSWORD "
+                "grafana/k6:0.33.0 run -",
+            ]
+            load_test_phases = {
+                "build": {
+                    "commands": load_test_commands
+                }
+            }
+            if load_test_rollback:
+                load_test_phases["post_build"] = {
+                    "commands": [
+                        "if [ \"$CODEBUILD_BUILD_SUCCEEDING\" = \"0\" ]; then "
+                        "echo \"Rolling back to $PREVIOUS_TASK_DEFINITION\"; "
+                        "aws ecs update-service --cluster $CLUSTER --service $SERVICE "
+                        "--task-definition $PREVIOUS_TASK_DEFINITION > /dev/null; "
+                        # the image passed: it becomes latest (see build_commands), unless it already is
+                        "else "
+                        f"DOCKER_TAG={env}-$(echo $CODEBUILD_RESOLVED_SOURCE_VERSION | cut -c -8); "
+                        f"aws ecr batch-get-image --repository-name {ecr_repo.repository_name} "
+                        "--image-ids imageTag=$DOCKER_TAG --accepted-media-types "
+                        "application/vnd.oci.image.index.v1+json "
+                        "application/vnd.docker.distribution.manifest.list.v2+json "
+                        "application/vnd.oci.image.manifest.v1+json "
+                        "application/vnd.docker.distribution.manifest.v2+json "
+                        "--query 'images[0].[imageManifestMediaType,imageManifest]' --output text > image.txt; "
+                        f"aws ecr describe-images --repository-name {ecr_repo.repository_name} "
+                        "--image-ids imageTag=latest --query 'imageDetails[0].imageTags' --output text 2> /dev/null "
+                        "| grep -qw $DOCKER_TAG "
+                        f"|| aws ecr put-image --repository-name {ecr_repo.repository_name} --image-tag latest "
+                        "--image-manifest-media-type $(cut -f1 image.txt) "
+                        "--image-manifest \"$(cut -f2- image.txt)\" "
+                        "> /dev/null; fi",
+                    ]
+                }
+
+            load_test_proj = PipelineProject(
+                self, "LoadTest",
+                environment=BuildEnvironment(
+                    build_image=LinuxBuildImage.STANDARD_5_0,
+                    privileged=True
+                ),
+                timeout=Duration.minutes(20),
+                build_spec=BuildSpec.from_object({
+                    "version": "0.2",
+                    "run-as": "root",
+                    "env": {
+                        "secrets-manager": {
+                            "EMAIL": f"{load_test_user.secret_arn}:email",
+                            "PASSWORD": f"{load_test_user.secret_arn}:password"
+                        },
+                        "variables": {
+                            "BASE_URL": f"http://{load_balancer_dns_name}",
+                            "VUS": str(load_test.vus),
+                            "DURATION": load_test.duration,
+                            "P95_MS": str(load_test.p95_ms),
+                            "P99_MS": str(load_test.p99_ms),
+                            "ERROR_RATE": str(load_test.error_rate),
+                            "CLUSTER": service.cluster.cluster_name,
+                            "SERVICE": service.service_name,
+                            "LOAD_TEST_SCRIPT": LOAD_TEST_SCRIPT.read_text()
+                        }
+                    },
+                    "phases": load_test_phases
+                })
+            )
+            load_test_user.grant_read(load_test_proj)
+            if load_test_rollback:
+                load_test_proj.add_to_role_policy(PolicyStatement(
+                    actions=["ecs:UpdateService"],
+                    resources=[service.service_arn]
+                ))
+                ecr_repo.grant(load_test_proj, "ecr:BatchGetImage", "ecr:DescribeImages", "ecr:PutImage")
+
+            pipeline.add_stage(
+                stage_name="LoadTest",
+                actions=[
+                    CodeBuildAction(
+                        action_name="LoadTest",
+                        project=load_test_proj,
+                        input=source_output,
+                        environment_variables={
+                            "PREVIOUS_TASK_DEFINITION": BuildEnvironmentVariable(
+                                value=pre_deploy_action.variable("TASK_DEFINITION")
+                            )
+                        } if load_test_rollback else None
+                    )
+                ]
+            )
+
+        # ==========================================================================================
+        # Pipeline Metrics
+
+        PipelineMetrics(
+            self, "Metrics",
+            pipeline=pipeline,
+            log_retention=log_retention
+        )
@@ -0,0 +1,101 @@
+from aws_cdk.aws_ec2 import IVpc, ISecurityGroup, SecurityGroup, Port
+from aws_cdk.aws_elasticache import CfnSubnetGroup, CfnReplicationGroup, CfnParameterGroup
+from aws_cdk.core import Construct
+
+
+class Cache(Construct):
+    """ElastiCache Redis replication group (Multi-AZ, automatic failover) in the Persistence subnets.
+
+    With ``num_node_groups`` > 0 the replication group runs in cluster mode (sharded) and the app gets the
+    configuration endpoint, otherwise the primary (``REDIS_HOST``) and the reader (``REDIS_READ_HOST``) endpoints.
+
+    With ``snapshot_name`` the replication group is seeded from an ElastiCache snapshot (e.g. of the replication
+    group of another stack, see the README).
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 vpc: IVpc,
+                 app_security_group: ISecurityGroup,
+                 node_type: str,
+                 num_cache_clusters: int,
+                 num_node_groups: int = 0,
+                 replicas_per_node_group: int = 1,
+                 maxmemory_policy: str = "allkeys-lru",
+                 reserved_memory_percent: int = 25,
+                 timeout: int = 0,
+                 snapshot_name: str = None) -> None:
+        super().__init__(scope, construct_id)
+
+        cluster_mode = num_node_groups > 0
+
+        redis_security_group = SecurityGroup(
+            self, "RedisSG",
+            vpc=vpc,
+            description="Redis Security Group",
+            allow_all_outbound=False
+        )
+
+        redis_security_group.connections.allow_from(app_security_group, Port.tcp(6379), "Fargate")
+
+        redis_subnet_group = CfnSubnetGroup(
+            self, "RedisSubnetGroup",
+            subnet_ids=vpc.select_subnets(subnet_group_name="Persistence").subnet_ids,
+            description="Redis"
+        )
+
+        # maxmemory-policy: the ORM cache can always be rebuilt from Aurora, so the least recently used keys
+        # are evicted instead of failing writes; reserved-memory-percent is kept for replication & snapshots
+        redis_parameter_group = CfnParameterGroup(
+            self, "RedisParameterGroup",
+            cache_parameter_group_family="redis6.x",
+            description="Notejam",
+            properties={
+                "cluster-enabled": "yes" if cluster_mode else "no",
+                "maxmemory-policy": maxmemory_policy,
+                "reserved-memory-percent": str(reserved_memory_percent),
+                "timeout": str(timeout),
+            }
+        )
+
+        redis = CfnReplicationGroup(
+            self, "RedisRG",
+            replication_group_description="Notejam",
+            automatic_failover_enabled=True,
+            auto_minor_version_upgrade=False,
+            cache_node_type=node_type,
+            cache_parameter_group_name=redis_parameter_group.ref,
+            cache_subnet_group_name=redis_subnet_group.ref,
+            engine="redis",
+            engine_version="6.x",
+            multi_az_enabled=True,
+            num_cache_clusters=None if cluster_mode else num_cache_clusters,
+            num_node_groups=num_node_groups if cluster_mode else None,
+            replicas_per_node_group=replicas_per_node_group if cluster_mode else None,
+            security_group_ids=[redis_security_group.security_group_id],
+            snapshot_name=snapshot_name,
+        )
+
+        # Member clusters are named <replication-group-id>-00N, or <replication-group-id>-000S-00N in cluster mode
+        if cluster_mode:
+            node_suffixes = [
+                f"{node_group:04d}-{node:03d}"
+                for node_group in range(1, num_node_groups + 1)
+                for node in range(1, replicas_per_node_group + 2)
+            ]
+            container_environment = {
+                "REDIS_HOST": redis.get_att(attribute_name='ConfigurationEndPoint.Address').to_string(),
+                "REDIS_PORT": redis.get_att(attribute_name='ConfigurationEndPoint.Port').to_string(),
+                "REDIS_CLUSTER_MODE": "true",
+            }
+        else:
+            node_suffixes = [f"{node:03d}" for node in range(1, num_cache_clusters + 1)]
+            container_environment = {
+                "REDIS_HOST": redis.get_att(attribute_name='PrimaryEndPoint.Address').to_string(),
+                "REDIS_READ_HOST": redis.get_att(attribute_name='ReaderEndPoint.Address').to_string(),
+                "REDIS_PORT": redis.get_att(attribute_name='PrimaryEndPoint.Port').to_string(),
+                "REDIS_CLUSTER_MODE": "false",
+            }
+
+        self.replication_group = redis
+        self.node_ids = [f"{redis.ref}-{suffix}" for suffix in node_suffixes]
+        self.container_environment = container_environment
@@ -0,0 +1,143 @@
+import os
+import re
+from typing import NamedTuple, Mapping
+
+from notejam.settings import settings_from_env
+
+# Valid Fargate task sizes: cpu units -> allowed memory (MiB)
+FARGATE_TASK_SIZES = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+}
+
+MAX_AZS = 3
+MAX_AURORA_REPLICAS = 15
+MAX_REDIS_REPLICAS_PER_NODE_GROUP = 5
+
+
+class CapacityProfile(NamedTuple):
+    """Sizing of every resource in the stack that has to grow with the load."""
+
+    db_instance_type: str
+    db_instances: int
+    db_replica_min_capacity: int
+    db_replica_max_capacity: int
+    redis_node_type: str
+    redis_num_cache_clusters: int
+    # > 0 enables cluster mode (sharding), redis_num_cache_clusters is then ignored
+    redis_num_node_groups: int
+    redis_replicas_per_node_group: int
+    task_cpu: int
+    task_memory: int
+    container_memory_reservation: int
+    nat_gateways: int
+    min_capacity: int
+    desired_capacity: int
+    max_capacity: int
+
+    def validate(self) -> "CapacityProfile":
+        errors = []
+
+        if not re.match(r"^[a-z0-9]+\.[a-z0-9]+$", self.db_instance_type):
+            errors.append(f"DB_INSTANCE_TYPE must look like 't3.small', got '{self.db_instance_type}'")
+        if not re.match(r"^cache\.[a-z0-9]+\.[a-z0-9]+$", self.redis_node_type):
+            errors.append(f"REDIS_NODE_TYPE must look like 'cache.t3.micro', got '{self.redis_node_type}'")
+
+        if self.db_instances < 1:
+            errors.append("DB_INSTANCES must be at least 1")
+        if not 0 <= self.db_replica_min_capacity <= self.db_replica_max_capacity <= MAX_AURORA_REPLICAS:
+            errors.append(f"DB_REPLICA_MIN_CAPACITY <= DB_REPLICA_MAX_CAPACITY <= {MAX_AURORA_REPLICAS} is required")
+
+        # automatic failover and Multi-AZ are enabled on the replication group
+        if self.redis_num_node_groups > 0:
+            if not 1 <= self.redis_replicas_per_node_group <= MAX_REDIS_REPLICAS_PER_NODE_GROUP:
+                errors.append(f"REDIS_REPLICAS_PER_NODE_GROUP must be between 1 and {MAX_REDIS_REPLICAS_PER_NODE_GROUP} "
+                              "(Multi-AZ with automatic failover)")
+        elif self.redis_num_node_groups < 0:
+            errors.append("REDIS_NUM_NODE_GROUPS must be 0 (cluster mode disabled) or more")
+        elif self.redis_num_cache_clusters < 2:
+            errors.append("REDIS_NUM_CACHE_CLUSTERS must be at least 2 (Multi-AZ with automatic failover)")
+
+        if self.task_memory not in FARGATE_TASK_SIZES.get(self.task_cpu, []):
+            errors.append(f"TASK_CPU={self.task_cpu} / TASK_MEMORY={self.task_memory} is not a valid Fargate task size")
+        if not 0 < self.container_memory_reservation <= self.task_memory:
+            errors.append("CONTAINER_MEMORY_RESERVATION must be between 1 and TASK_MEMORY")
+
+        if not 1 <= self.nat_gateways <= MAX_AZS:
+            errors.append(f"NAT_GATEWAYS must be between 1 and {MAX_AZS}")
+
+        if not 0 <= self.min_capacity <= self.desired_capacity <= self.max_capacity:
+            errors.append("MIN_CAPACITY <= DESIRED_CAPACITY <= MAX_CAPACITY is required")
+
+        if errors:
+            raise ValueError("Invalid capacity profile:\n  " + "\n  ".join(errors))
+
+        return self
+
+
+CAPACITY_PROFILES = {
+    "small": CapacityProfile(
+        db_instance_type="t3.small",
+        db_instances=2,
+        db_replica_min_capacity=1,
+        db_replica_max_capacity=1,
+        redis_node_type="cache.t3.micro",
+        redis_num_cache_clusters=2,
+        redis_num_node_groups=0,
+        redis_replicas_per_node_group=1,
+        task_cpu=1024,
+        task_memory=2048,
+        container_memory_reservation=256,
+        nat_gateways=3,
+        min_capacity=1,
+        desired_capacity=1,
+        max_capacity=3,
+    ),
+    "medium": CapacityProfile(
+        db_instance_type="t3.medium",
+        db_instances=2,
+        db_replica_min_capacity=1,
+        db_replica_max_capacity=4,
+        redis_node_type="cache.t3.small",
+        redis_num_cache_clusters=2,
+        redis_num_node_groups=0,
+        redis_replicas_per_node_group=1,
+        task_cpu=1024,
+        task_memory=2048,
+        container_memory_reservation=512,
+        nat_gateways=3,
+        min_capacity=2,
+        desired_capacity=2,
+        max_capacity=8,
+    ),
+    "large": CapacityProfile(
+        db_instance_type="r5.large",
+        db_instances=3,
+        db_replica_min_capacity=2,
+        db_replica_max_capacity=8,
+        redis_node_type="cache.r6g.large",
+        redis_num_cache_clusters=3,
+        redis_num_node_groups=2,
+        redis_replicas_per_node_group=1,
+        task_cpu=2048,
+        task_memory=4096,
+        container_memory_reservation=1024,
+        nat_gateways=3,
+        min_capacity=4,
+        desired_capacity=4,
+        max_capacity=20,
+    ),
+}
+
+
+def capacity_profile_from_env(environ: Mapping[str, str] = os.environ) -> CapacityProfile:
+    """Named tier from CAPACITY_PROFILE, with each field overridable by its upper-cased env var."""
+
+    profile_name = environ.get("CAPACITY_PROFILE", "small")
+    if profile_name not in CAPACITY_PROFILES:
+        raise ValueError(f"Unknown CAPACITY_PROFILE '{profile_name}', expected one of: {', '.join(CAPACITY_PROFILES)}")
+
+    return settings_from_env(CAPACITY_PROFILES[profile_name], environ=environ).validate()
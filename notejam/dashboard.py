@@ -0,0 +1,167 @@
+import os
+from typing import NamedTuple, Mapping, Sequence
+
+from aws_cdk.aws_cloudfront import IDistribution
+from aws_cdk.aws_cloudwatch import Dashboard, GraphWidget, Metric, Alarm, ComparisonOperator, TreatMissingData, \
+    AlarmStatusWidget, TextWidget, IMetric
+from aws_cdk.aws_ecs import FargateService
+from aws_cdk.aws_elasticloadbalancingv2 import ApplicationLoadBalancer, ApplicationTargetGroup, HttpCodeElb, \
+    HttpCodeTarget
+from aws_cdk.aws_rds import DatabaseCluster
+from aws_cdk.core import Construct, Duration
+
+from notejam.settings import settings_from_env
+
+
+class AlarmThresholds(NamedTuple):
+    """Latency and saturation thresholds, each overridable by ALARM_<FIELD> (e.g. ALARM_LATENCY_P95)."""
+
+    latency_p95: float = 0.5
+    latency_p99: float = 1.5
+    target_5xx_count: int = 10
+    ecs_cpu: int = 80
+    ecs_memory: int = 80
+    db_cpu: int = 80
+    db_connections: int = 40
+    redis_cpu: int = 80
+    redis_evictions: int = 100
+
+
+def alarm_thresholds_from_env(environ: Mapping[str, str] = os.environ) -> AlarmThresholds:
+    return settings_from_env(AlarmThresholds(), "ALARM_", environ)
+
+
+class NotejamDashboard(Construct):
+    """CloudWatch Dashboard + alarms for the latency and saturation signals of every tier."""
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 load_balancer: ApplicationLoadBalancer,
+                 target_group: ApplicationTargetGroup,
+                 service: FargateService,
+                 database: DatabaseCluster,
+                 redis_nodes: Sequence[str],
+                 distribution: IDistribution,
+                 thresholds: AlarmThresholds,
+                 startup_metrics: Sequence[IMetric] = ()) -> None:
+        super().__init__(scope, construct_id)
+
+        period = Duration.minutes(1)
+
+        # ==========================================================================================
+        # Metrics
+
+        latency = {
+            statistic: target_group.metric_target_response_time(statistic=statistic, period=period, label=statistic)
+            for statistic in ["p50", "p95", "p99"]
+        }
+        requests = load_balancer.metric_request_count(period=period, label="Requests")
+        elb_5xx = load_balancer.metric_http_code_elb(HttpCodeElb.ELB_5XX_COUNT, period=period, label="ELB 5xx")
+        target_5xx = target_group.metric_http_code_target(
+            HttpCodeTarget.TARGET_5XX_COUNT, period=period, label="Target 5xx")
+
+        ecs_cpu = service.metric_cpu_utilization(period=period, label="CPU Avg")
+        ecs_cpu_max = service.metric_cpu_utilization(period=period, statistic="Maximum", label="CPU Max")
+        ecs_memory = service.metric_memory_utilization(period=period, label="Memory Avg")
+        ecs_memory_max = service.metric_memory_utilization(period=period, statistic="Maximum", label="Memory Max")
+
+        db_cpu = database.metric_cpu_utilization(period=period, label="CPU")
+        db_connections = database.metric_database_connections(period=period, label="Connections")
+        db_replica_lag = database.metric("AuroraReplicaLag", period=period, statistic="Maximum", label="Replica Lag")
+
+        redis_cpu = self._redis_metrics("EngineCPUUtilization", redis_nodes, "Average", period)
+        redis_evictions = self._redis_metrics("Evictions", redis_nodes, "Sum", period)
+        redis_hit_rate = self._redis_metrics("CacheHitRate", redis_nodes, "Average", period)
+
+        # CloudFront metrics only exist in us-east-1
+        cf_metric_props = dict(
+            namespace="AWS/CloudFront",
+            dimensions={"DistributionId": distribution.distribution_id, "Region": "Global"},
+            region="us-east-1",
+            period=period
+        )
+        cf_requests = Metric(metric_name="Requests", statistic="Sum", label="Requests", **cf_metric_props)
+        cf_hit_rate = Metric(metric_name="CacheHitRate", statistic="Average", label="Cache Hit Rate", **cf_metric_props)
+        cf_5xx_rate = Metric(metric_name="5xxErrorRate", statistic="Average", label="5xx Error Rate", **cf_metric_props)
+
+        # ==========================================================================================
+        # Alarms
+
+        alarms = [
+            self._alarm("LatencyP95", latency["p95"], thresholds.latency_p95, "ALB p95 TargetResponseTime (s)"),
+            self._alarm("LatencyP99", latency["p99"], thresholds.latency_p99, "ALB p99 TargetResponseTime (s)"),
+            self._alarm("Target5xx", target_5xx, thresholds.target_5xx_count, "Target 5xx responses / min"),
+            self._alarm("EcsCpu", ecs_cpu, thresholds.ecs_cpu, "ECS Service CPU (%)"),
+            self._alarm("EcsMemory", ecs_memory, thresholds.ecs_memory, "ECS Service Memory (%)"),
+            self._alarm("DbCpu", db_cpu, thresholds.db_cpu, "Aurora CPU (%)"),
+            self._alarm("DbConnections", db_connections, thresholds.db_connections, "Aurora Connections"),
+        ]
+        for index, metric in enumerate(redis_cpu, start=1):
+            alarms.append(self._alarm(f"RedisCpu{index:03d}", metric, thresholds.redis_cpu, "Redis Engine CPU (%)"))
+        for index, metric in enumerate(redis_evictions, start=1):
+            alarms.append(self._alarm(
+                f"RedisEvictions{index:03d}", metric, thresholds.redis_evictions, "Redis Evictions / min"))
+
+        # ==========================================================================================
+        # Dashboard
+
+        dashboard = Dashboard(self, "Dashboard")
+        dashboard.add_widgets(
+            TextWidget(markdown="# Notejam - Performance", width=24, height=1)
+        )
+        dashboard.add_widgets(
+            AlarmStatusWidget(alarms=alarms, title="Alarms", width=24, height=3)
+        )
+        dashboard.add_widgets(
+            GraphWidget(title="ALB - Target Response Time", left=list(latency.values()), width=12),
+            GraphWidget(title="ALB - Requests / 5xx", left=[requests], right=[elb_5xx, target_5xx], width=12),
+        )
+        dashboard.add_widgets(
+            GraphWidget(title="ECS - CPU", left=[ecs_cpu, ecs_cpu_max], width=12),
+            GraphWidget(title="ECS - Memory", left=[ecs_memory, ecs_memory_max], width=12),
+        )
+        if startup_metrics:
+            dashboard.add_widgets(
+                GraphWidget(title="ECS - Task Startup (p90, s)", left=list(startup_metrics), width=24),
+            )
+        dashboard.add_widgets(
+            GraphWidget(title="Aurora - CPU", left=[db_cpu], width=8),
+            GraphWidget(title="Aurora - Connections", left=[db_connections], width=8),
+            GraphWidget(title="Aurora - Replica Lag (ms)", left=[db_replica_lag], width=8),
+        )
+        dashboard.add_widgets(
+            GraphWidget(title="Redis - Engine CPU", left=redis_cpu, width=8),
+            GraphWidget(title="Redis - Evictions", left=redis_evictions, width=8),
+            GraphWidget(title="Redis - Cache Hit Rate", left=redis_hit_rate, width=8),
+        )
+        dashboard.add_widgets(
+            GraphWidget(title="CloudFront - Requests", left=[cf_requests], width=12),
+            GraphWidget(title="CloudFront - Cache Hit Rate / 5xx", left=[cf_hit_rate], right=[cf_5xx_rate], width=12),
+        )
+
+        self.dashboard = dashboard
+        self.alarms = alarms
+
+    @staticmethod
+    def _redis_metrics(metric_name: str, nodes: Sequence[str], statistic: str, period: Duration) -> list:
+        return [
+            Metric(
+                namespace="AWS/ElastiCache",
+                metric_name=metric_name,
+                dimensions={"CacheClusterId": node},
+                statistic=statistic,
+                period=period,
+                label=node
+            ) for node in nodes
+        ]
+
+    def _alarm(self, construct_id: str, metric: IMetric, threshold: float, description: str) -> Alarm:
+        return Alarm(
+            self, construct_id,
+            metric=metric,
+            threshold=threshold,
+            evaluation_periods=3,
+            datapoints_to_alarm=3,
+            comparison_operator=ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=TreatMissingData.NOT_BREACHING,
+            alarm_description=description
+        )
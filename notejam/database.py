@@ -0,0 +1,231 @@
+from aws_cdk.aws_applicationautoscaling import ScalableTarget, ServiceNamespace, PredefinedMetric
+from aws_cdk.aws_ec2 import IVpc, ISecurityGroup, InstanceType, SubnetSelection, SecurityGroup, Port
+from aws_cdk.aws_ecs import Secret
+from aws_cdk.aws_logs import RetentionDays
+from aws_cdk.aws_rds import DatabaseCluster, AuroraMysqlEngineVersion, Credentials, DatabaseClusterEngine, InstanceProps, \
+    CfnDBProxyEndpoint, ParameterGroup, DatabaseClusterFromSnapshot, DatabaseSecret
+from aws_cdk.core import Construct, Duration, RemovalPolicy
+
+# Performance Insights is not available on the smallest burstable classes
+PERFORMANCE_INSIGHTS_UNSUPPORTED = ["t2.micro", "t2.small", "t3.micro", "t3.small", "t4g.micro", "t4g.small"]
+
+
+class Database(Construct):
+    """Aurora MySQL cluster with read replica auto scaling and an optional RDS Proxy.
+
+    ``container_environment`` / ``container_secrets`` hold the ``DB_*`` variables for the app container,
+    pointing either to the cluster or to the proxy.
+
+    The slow query log is always on (``long_query_time``) and exported to CloudWatch Logs; Performance Insights
+    and Enhanced Monitoring are optional.
+
+    With ``snapshot_identifier`` the cluster is restored from a snapshot (e.g. of the cluster of another stack,
+    see the README) with a new master password. Changing or removing it later replaces the cluster.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 env: str,
+                 vpc: IVpc,
+                 app_security_group: ISecurityGroup,
+                 migrations_security_group: ISecurityGroup,
+                 instance_type: str,
+                 instances: int,
+                 replica_min_capacity: int,
+                 replica_max_capacity: int,
+                 replica_target_cpu: int,
+                 replica_target_connections: int,
+                 proxy_enabled: bool = False,
+                 proxy_max_connections_percent: int = 90,
+                 proxy_max_idle_connections_percent: int = 50,
+                 proxy_idle_client_timeout: Duration = Duration.minutes(30),
+                 proxy_borrow_timeout: Duration = Duration.minutes(2),
+                 performance_insights: bool = False,
+                 monitoring_interval: Duration = None,
+                 long_query_time: float = 1.0,
+                 max_connections: int = None,
+                 wait_timeout: int = 28800,
+                 log_retention: RetentionDays = RetentionDays.ONE_MONTH,
+                 snapshot_identifier: str = None) -> None:
+        super().__init__(scope, construct_id)
+
+        if performance_insights and instance_type in PERFORMANCE_INSIGHTS_UNSUPPORTED:
+            raise ValueError(f"Performance Insights is not supported on db.{instance_type}")
+
+        # ==========================================================================================
+        # Security Groups
+
+        rds_security_group = SecurityGroup(
+            self, "RDS",
+            vpc=vpc,
+            description="RDS Security Group",
+            allow_all_outbound=False
+        )
+
+        rds_security_group.connections.allow_from(app_security_group, Port.tcp(3306), "Fargate")
+        rds_security_group.connections.allow_from(migrations_security_group, Port.tcp(3306), "CodeBuild")
+
+        # ==========================================================================================
+        # Aurora - Parameter Groups
+
+        engine = DatabaseClusterEngine.aurora_mysql(version=AuroraMysqlEngineVersion.VER_2_09_1)
+
+        cluster_parameter_group = ParameterGroup(
+            self, "ClusterParameterGroup",
+            engine=engine,
+            description="Notejam - Aurora MySQL cluster",
+            parameters={
+                "slow_query_log": "1",
+                "long_query_time": str(long_query_time),
+                "log_output": "FILE",
+            }
+        )
+
+        instance_parameters = {
+            "innodb_buffer_pool_size": "{DBInstanceClassMemory*3/4}",
+            "wait_timeout": str(wait_timeout),
+            "interactive_timeout": str(wait_timeout),
+            # Performance Insights reads the Performance Schema (static parameter, applied on reboot)
+            "performance_schema": "1" if performance_insights else "0",
+        }
+        # without it, max_connections keeps the instance class based default
+        if max_connections:
+            instance_parameters["max_connections"] = str(max_connections)
+
+        instance_parameter_group = ParameterGroup(
+            self, "InstanceParameterGroup",
+            engine=engine,
+            description="Notejam - Aurora MySQL instances",
+            parameters=instance_parameters
+        )
+
+        # ==========================================================================================
+        # Aurora Cluster
+
+        instance_props = InstanceProps(
+            instance_type=InstanceType(instance_type),
+            parameter_group=instance_parameter_group,
+            enable_performance_insights=performance_insights,
+            publicly_accessible=False,
+            security_groups=[rds_security_group],
+            vpc_subnets=SubnetSelection(subnet_group_name="Persistence"),
+            vpc=vpc
+        )
+
+        if snapshot_identifier:
+            # the snapshot keeps its master user (admin), only the password is reset to the new secret
+            master_secret = DatabaseSecret(self, "Secret", username="admin")
+            aurora = DatabaseClusterFromSnapshot(
+                self, "Database",
+                engine=engine,
+                snapshot_identifier=snapshot_identifier,
+                parameter_group=cluster_parameter_group,
+                instance_props=instance_props,
+                instances=instances,
+                monitoring_interval=monitoring_interval,
+                cloudwatch_logs_exports=["slowquery", "error"],
+                cloudwatch_logs_retention=log_retention,
+                removal_policy=RemovalPolicy.SNAPSHOT
+            )
+            aurora.node.default_child.add_property_override(
+                "MasterUserPassword", master_secret.secret_value_from_json("password").to_string()
+            )
+            secret = master_secret.attach(aurora)
+        else:
+            aurora = DatabaseCluster(
+                self, "Database",
+                engine=engine,
+                parameter_group=cluster_parameter_group,
+                instance_props=instance_props,
+                credentials=Credentials.from_generated_secret("admin"),
+                default_database_name="notejam",
+                instances=instances,
+                monitoring_interval=monitoring_interval,
+                cloudwatch_logs_exports=["slowquery", "error"],
+                cloudwatch_logs_retention=log_retention,
+                removal_policy=RemovalPolicy.SNAPSHOT
+            )
+            secret = aurora.secret
+
+        # ==========================================================================================
+        # Aurora - Read Replica Auto Scaling
+
+        db_replica_scaling = ScalableTarget(
+            self, "DatabaseReplicaScaling",
+            service_namespace=ServiceNamespace.RDS,
+            resource_id=f"cluster:{aurora.cluster_identifier}",
+            scalable_dimension="rds:cluster:ReadReplicaCount",
+            min_capacity=replica_min_capacity,
+            max_capacity=replica_max_capacity
+        )
+        db_replica_scaling.node.add_dependency(aurora)
+
+        db_replica_scaling.scale_to_track_metric(
+            "CpuScaling",
+            predefined_metric=PredefinedMetric.RDS_READER_AVERAGE_CPU_UTILIZATION,
+            target_value=replica_target_cpu
+        )
+        db_replica_scaling.scale_to_track_metric(
+            "ConnectionsScaling",
+            predefined_metric=PredefinedMetric.RDS_READER_AVERAGE_DATABASE_CONNECTIONS,
+            target_value=replica_target_connections
+        )
+
+        # ==========================================================================================
+        # Aurora - RDS Proxy
+
+        container_environment = {
+            "DB_READ_HOST": aurora.cluster_read_endpoint.hostname,
+        }
+        container_secrets = {
+            "DB_HOST": Secret.from_secrets_manager(secret, "host"),
+        }
+
+        if proxy_enabled:
+            db_proxy_security_group = SecurityGroup(
+                self, "RDSProxy",
+                vpc=vpc,
+                description="RDS Proxy Security Group",
+                allow_all_outbound=False
+            )
+
+            # the Proxy -> Aurora rule is added by add_proxy()
+            db_proxy_security_group.connections.allow_from(app_security_group, Port.tcp(3306), "Fargate")
+
+            db_proxy = aurora.add_proxy(
+                "Proxy",
+                secrets=[secret],
+                vpc=vpc,
+                vpc_subnets=SubnetSelection(subnet_group_name="Persistence"),
+                security_groups=[db_proxy_security_group],
+                require_tls=False,
+                max_connections_percent=proxy_max_connections_percent,
+                max_idle_connections_percent=proxy_max_idle_connections_percent,
+                idle_client_timeout=proxy_idle_client_timeout,
+                borrow_timeout=proxy_borrow_timeout
+            )
+
+            db_proxy_read_endpoint = CfnDBProxyEndpoint(
+                self, "ProxyReadEndpoint",
+                db_proxy_endpoint_name=f"notejam-{env}-read",
+                db_proxy_name=db_proxy.db_proxy_name,
+                vpc_subnet_ids=vpc.select_subnets(subnet_group_name="Persistence").subnet_ids,
+                vpc_security_group_ids=[db_proxy_security_group.security_group_id],
+                target_role="READ_ONLY"
+            )
+
+            container_environment = {
+                "DB_HOST": db_proxy.endpoint,
+                "DB_READ_HOST": db_proxy_read_endpoint.attr_endpoint,
+            }
+            container_secrets = {}
+
+        container_secrets.update({
+            "DB_NAME": Secret.from_secrets_manager(secret, "dbname"),
+            "DB_USERNAME": Secret.from_secrets_manager(secret, "username"),
+            "DB_PASSWORD": Secret.from_secrets_manager(secret, "password"),
+        })
+
+        self.cluster = aurora
+        self.secret = secret
+        self.container_environment = container_environment
+        self.container_secrets = container_secrets
@@ -0,0 +1,132 @@
+from typing import Sequence
+
+from aws_cdk.aws_cloudfront import Distribution, BehaviorOptions, ViewerProtocolPolicy, AllowedMethods, CachePolicy, \
+    PriceClass, OriginProtocolPolicy, OriginRequestPolicy, CachedMethods, CacheCookieBehavior, CacheHeaderBehavior, \
+    CacheQueryStringBehavior, OriginRequestCookieBehavior, OriginRequestHeaderBehavior, OriginRequestQueryStringBehavior
+from aws_cdk.aws_cloudfront_origins import LoadBalancerV2Origin
+from aws_cdk.aws_elasticloadbalancingv2 import ILoadBalancerV2
+from aws_cdk.core import Construct, Duration, CfnOutput, CfnResource, Stack
+
+
+class Edge(Construct):
+    """CloudFront Distribution in front of the ALB, with cached behaviors for the static assets."""
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 env: str,
+                 load_balancer: ILoadBalancerV2,
+                 static_path_patterns: Sequence[str],
+                 static_default_ttl: Duration,
+                 static_max_ttl: Duration,
+                 page_default_ttl: Duration,
+                 page_max_ttl: Duration,
+                 page_cache_cookies: Sequence[str],
+                 origin_request_headers: Sequence[str],
+                 additional_metrics: bool,
+                 origin_keepalive_timeout: Duration = Duration.seconds(5),
+                 origin_read_timeout: Duration = Duration.seconds(30),
+                 trace_headers: bool = False) -> None:
+        super().__init__(scope, construct_id)
+
+        # keepalive_timeout must stay below the ALB idle timeout, or CloudFront reuses connections the ALB closed
+        origin = LoadBalancerV2Origin(
+            load_balancer,
+            protocol_policy=OriginProtocolPolicy.HTTP_ONLY,
+            keepalive_timeout=origin_keepalive_timeout,
+            read_timeout=origin_read_timeout
+        )
+
+        # Static assets: no cookies/headers in the cache key, query string kept for cache busting
+        static_cache_policy = CachePolicy(
+            self, "StaticCachePolicy",
+            comment=f"Notejam {env} - static assets",
+            default_ttl=static_default_ttl,
+            min_ttl=Duration.seconds(0),
+            max_ttl=static_max_ttl,
+            cookie_behavior=CacheCookieBehavior.none(),
+            header_behavior=CacheHeaderBehavior.none(),
+            query_string_behavior=CacheQueryStringBehavior.all(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True
+        )
+
+        # Pages: keyed by the session cookie so anonymous and per-user responses never mix,
+        # origin Cache-Control headers decide what is actually cached (up to max_ttl).
+        # With max_ttl 0 nothing is cached, and CloudFront rejects cache key & compression settings
+        # on such a policy: the managed CachingDisabled policy is used instead
+        if page_max_ttl.to_seconds() == 0:
+            page_cache_policy = CachePolicy.CACHING_DISABLED
+        else:
+            page_cache_policy = CachePolicy(
+                self, "PageCachePolicy",
+                comment=f"Notejam {env} - pages",
+                default_ttl=page_default_ttl,
+                min_ttl=Duration.seconds(0),
+                max_ttl=page_max_ttl,
+                cookie_behavior=CacheCookieBehavior.allow_list(*page_cache_cookies),
+                header_behavior=CacheHeaderBehavior.none(),
+                query_string_behavior=CacheQueryStringBehavior.all(),
+                enable_accept_encoding_gzip=True,
+                enable_accept_encoding_brotli=True
+            )
+
+        # trace context sent by the clients is passed on to the ALB, which adds X-Amzn-Trace-Id if missing
+        if trace_headers:
+            origin_request_headers = [*origin_request_headers, "X-Amzn-Trace-Id", "traceparent", "tracestate"]
+
+        page_origin_request_policy = OriginRequestPolicy(
+            self, "PageOriginRequestPolicy",
+            comment=f"Notejam {env} - pages",
+            cookie_behavior=OriginRequestCookieBehavior.all(),
+            header_behavior=OriginRequestHeaderBehavior.allow_list(*origin_request_headers),
+            query_string_behavior=OriginRequestQueryStringBehavior.all()
+        )
+
+        static_behavior = BehaviorOptions(
+            origin=origin,
+            allowed_methods=AllowedMethods.ALLOW_GET_HEAD,
+            cached_methods=CachedMethods.CACHE_GET_HEAD,
+            viewer_protocol_policy=ViewerProtocolPolicy.ALLOW_ALL,
+            cache_policy=static_cache_policy,
+            compress=True
+        )
+
+        cf = Distribution(
+            self, "myDist",
+            price_class=PriceClass.PRICE_CLASS_100,
+
+            default_behavior=BehaviorOptions(
+                origin=origin,
+                allowed_methods=AllowedMethods.ALLOW_ALL,
+                viewer_protocol_policy=ViewerProtocolPolicy.ALLOW_ALL,
+                cache_policy=page_cache_policy,
+                origin_request_policy=page_origin_request_policy,
+                compress=True
+            ),
+            additional_behaviors={
+                path_pattern: static_behavior for path_pattern in static_path_patterns
+            }
+        )
+
+        # CacheHitRate & co. are only published with the additional metrics subscription (paid)
+        if additional_metrics:
+            CfnResource(
+                self, "myDistMonitoring",
+                type="AWS::CloudFront::MonitoringSubscription",
+                properties={
+                    "DistributionId": cf.distribution_id,
+                    "MonitoringSubscription": {
+                        "RealtimeMetricsSubscriptionConfig": {
+                            "RealtimeMetricsSubscriptionStatus": "Enabled"
+                        }
+                    }
+                }
+            )
+
+        CfnOutput(
+            self, "CloudFrontDomainName",
+            value=cf.domain_name,
+            description="CloudFront Domain Name",
+            export_name=f"{Stack.of(self).stack_name}-cloud-front-domain-name"
+        )
+
+        self.distribution = cf
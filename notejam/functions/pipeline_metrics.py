@@ -0,0 +1,72 @@
+"""CodePipeline Action / Pipeline Execution State Change -> durations as CloudWatch metrics (Embedded Metric Format).
+
+Deployed inline (see notejam/pipeline_metrics.py), so it must only use the standard library and boto3.
+"""
+
+import json
+from datetime import datetime
+
+NAMESPACE = "Notejam/CodePipeline"
+ACTION_EVENT = "CodePipeline Action Execution State Change"
+
+
+def codepipeline():
+    import boto3
+    return boto3.client("codepipeline")
+
+
+def action_duration(client, detail):
+    executions = client.list_action_executions(
+        pipelineName=detail["pipeline"],
+        filter={"pipelineExecutionId": detail["execution-id"]}
+    )["actionExecutionDetails"]
+    attempts = [execution for execution in executions
+                if execution["stageName"] == detail["stage"] and execution["actionName"] == detail["action"]]
+    if not attempts:
+        return None
+    # retried actions have one execution per attempt
+    attempt = max(attempts, key=lambda execution: execution["startTime"])
+    return (attempt["lastUpdateTime"] - attempt["startTime"]).total_seconds()
+
+
+def pipeline_duration(client, detail):
+    paginator = client.get_paginator("list_pipeline_executions")
+    for page in paginator.paginate(pipelineName=detail["pipeline"]):
+        for execution in page["pipelineExecutionSummaries"]:
+            if execution["pipelineExecutionId"] == detail["execution-id"]:
+                return (execution["lastUpdateTime"] - execution["startTime"]).total_seconds()
+    return None
+
+
+def handler(event, context):
+    detail = event["detail"]
+    client = codepipeline()
+
+    if event["detail-type"] == ACTION_EVENT:
+        metric = "ActionDuration"
+        dimensions = {"PipelineName": detail["pipeline"], "StageName": detail["stage"], "ActionName": detail["action"]}
+        duration = action_duration(client, detail)
+    elif detail["state"] == "SUCCEEDED":
+        metric = "PipelineDuration"
+        dimensions = {"PipelineName": detail["pipeline"]}
+        duration = pipeline_duration(client, detail)
+    else:
+        return
+
+    if duration is None:
+        return
+
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(datetime.strptime(event["time"], "%Y-%m-%dT%H:%M:%SZ").timestamp() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": metric, "Unit": "Seconds"}],
+            }],
+        },
+        **dimensions,
+        "ExecutionId": detail["execution-id"],
+        "State": detail["state"],
+        metric: duration,
+    }))
@@ -0,0 +1,77 @@
+"""ECS Task State Change (RUNNING, HEALTHY) -> task startup phases as CloudWatch metrics (Embedded Metric Format).
+
+Deployed inline (see notejam/startup_metrics.py), so it must only use the standard library and boto3.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+NAMESPACE = "Notejam/ECS"
+
+
+def dynamodb():
+    import boto3
+    return boto3.client("dynamodb")
+
+
+def parse(timestamp):
+    for timestamp_format in ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            return datetime.strptime(timestamp, timestamp_format)
+        except ValueError:
+            pass
+    raise ValueError(f"Unexpected timestamp: {timestamp}")
+
+
+def seconds(detail, start, end):
+    if start in detail and end in detail:
+        return (parse(detail[end]) - parse(detail[start])).total_seconds()
+    return None
+
+
+def first_healthy(client, detail):
+    """Whether this is the first HEALTHY event of the task: ECS sends more of them with a later updatedAt
+    (health flapping, a non-essential container exiting), which would count the task again."""
+
+    expires_at = parse(detail["updatedAt"]) + timedelta(days=1)
+    try:
+        client.put_item(
+            TableName=os.environ["TABLE_NAME"],
+            Item={"taskArn": {"S": detail["taskArn"]}, "expiresAt": {"N": str(int(expires_at.timestamp()))}},
+            ConditionExpression="attribute_not_exists(taskArn)"
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+    return True
+
+
+def handler(event, context):
+    detail = event["detail"]
+
+    if detail.get("healthStatus") != "HEALTHY":
+        return
+    phases = {
+        "ProvisioningTime": seconds(detail, "createdAt", "pullStartedAt"),
+        "ImagePullTime": seconds(detail, "pullStartedAt", "pullStoppedAt"),
+        "ContainerStartTime": seconds(detail, "pullStoppedAt", "startedAt"),
+        "TimeToHealthy": seconds(detail, "startedAt", "updatedAt"),
+        "TaskStartupTime": seconds(detail, "createdAt", "updatedAt"),
+    }
+    phases = {name: value for name, value in phases.items() if value is not None}
+    if not phases or not first_healthy(dynamodb(), detail):
+        return
+
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(parse(detail["updatedAt"]).timestamp() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [["ServiceName"]],
+                "Metrics": [{"Name": name, "Unit": "Seconds"} for name in phases],
+            }],
+        },
+        "ServiceName": detail["group"].split(":", 1)[-1],
+        "TaskArn": detail["taskArn"],
+        **phases,
+    }))
@@ -0,0 +1,137 @@
+import re
+
+from aws_cdk.aws_ec2 import Vpc, SubnetConfiguration, SubnetType, Port, SecurityGroup, Peer, SubnetSelection, \
+    GatewayVpcEndpointAwsService, InterfaceVpcEndpointAwsService
+from aws_cdk.core import Construct
+
+
+class Network(Construct):
+    """VPC and the Security Groups of the tiers that connect to the data layer (ALB, Fargate, CodeBuild).
+
+    The data layer Security Groups live next to their resources (see ``Database`` and ``Cache``), so that every
+    rule is owned by the stack that is deployed last and no reference goes back to this stack.
+
+    With ``vpc_endpoints`` the AWS APIs used by the tasks (ECR, S3 for the image layers, CloudWatch Logs,
+    Secrets Manager) are reached through VPC endpoints instead of the NAT Gateways, and the Fargate tasks
+    lose their 443 egress to the internet (``s3_prefix_list_id`` narrows the S3 rule down to the S3 prefix list).
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 vpc_cidr: str,
+                 nat_gateways: int,
+                 vpc_endpoints: bool = False,
+                 s3_prefix_list_id: str = None,
+                 tracing: bool = False) -> None:
+        super().__init__(scope, construct_id)
+
+        if s3_prefix_list_id and not re.match(r"^pl-[0-9a-f]+$", s3_prefix_list_id):
+            raise ValueError(f"Invalid S3_PREFIX_LIST_ID '{s3_prefix_list_id}', expected pl-<id>")
+
+        # ==========================================================================================
+        # VPC
+
+        vpc = Vpc(
+            self, "VPC",
+            cidr=vpc_cidr,
+            max_azs=3,
+            subnet_configuration=[
+                SubnetConfiguration(
+                    cidr_mask=24,
+                    name="Application",
+                    subnet_type=SubnetType.PRIVATE
+                ),
+                SubnetConfiguration(
+                    subnet_type=SubnetType.PUBLIC,
+                    name="Public",
+                    cidr_mask=28
+                ), SubnetConfiguration(
+                    cidr_mask=28,
+                    name="Persistence",
+                    subnet_type=SubnetType.PRIVATE,
+                )
+            ],
+            nat_gateways=nat_gateways
+        )
+
+        # ==========================================================================================
+        # Security Groups
+
+        lb_security_group = SecurityGroup(
+            self, "LBSG",
+            vpc=vpc,
+            description="Load Balancer Security Group",
+            allow_all_outbound=False
+        )
+
+        fargate_security_group = SecurityGroup(
+            self, "Fargate",
+            vpc=vpc,
+            description="Fargate Security Group",
+            allow_all_outbound=False
+        )
+
+        code_build_security_group = SecurityGroup(
+            self, "CodeBuild",
+            vpc=vpc,
+            description="CodeBuild Security Group",
+            allow_all_outbound=False
+        )
+
+        code_build_security_group.connections.allow_to(Peer.any_ipv4(), Port.tcp(80))
+        code_build_security_group.connections.allow_to(Peer.any_ipv4(), Port.tcp(443))
+
+        if not vpc_endpoints:
+            fargate_security_group.connections.allow_to(Peer.any_ipv4(), Port.tcp(443), "ECR")
+
+        # ==========================================================================================
+        # VPC Endpoints
+
+        if vpc_endpoints:
+            # ECR image layers are served from S3
+            vpc.add_gateway_endpoint(
+                "S3",
+                service=GatewayVpcEndpointAwsService.S3,
+                subnets=[
+                    SubnetSelection(subnet_group_name="Application"),
+                    SubnetSelection(subnet_group_name="Persistence")
+                ]
+            )
+
+            endpoints_security_group = SecurityGroup(
+                self, "Endpoints",
+                vpc=vpc,
+                description="VPC Endpoints Security Group",
+                allow_all_outbound=False
+            )
+
+            endpoints_security_group.connections.allow_from(fargate_security_group, Port.tcp(443), "Fargate")
+            endpoints_security_group.connections.allow_from(code_build_security_group, Port.tcp(443), "CodeBuild")
+
+            interface_endpoints = [
+                ("EcrApi", InterfaceVpcEndpointAwsService.ECR),
+                ("EcrDocker", InterfaceVpcEndpointAwsService.ECR_DOCKER),
+                ("Logs", InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS),
+                ("SecretsManager", InterfaceVpcEndpointAwsService.SECRETS_MANAGER),
+            ]
+            if tracing:
+                # no XRAY constant in this CDK version
+                interface_endpoints.append(("XRay", InterfaceVpcEndpointAwsService("xray")))
+
+            for endpoint_id, service in interface_endpoints:
+                vpc.add_interface_endpoint(
+                    endpoint_id,
+                    service=service,
+                    subnets=SubnetSelection(subnet_group_name="Application"),
+                    security_groups=[endpoints_security_group],
+                    private_dns_enabled=True,
+                    open=False
+                )
+
+            # the S3 gateway endpoint has no ENI, the traffic goes to the S3 public ranges
+            s3_peer = Peer.prefix_list(s3_prefix_list_id) if s3_prefix_list_id else Peer.any_ipv4()
+            fargate_security_group.connections.allow_to(s3_peer, Port.tcp(443), "S3 (gateway endpoint)")
+
+        self.vpc = vpc
+        self.lb_security_group = lb_security_group
+        self.fargate_security_group = fargate_security_group
+        self.code_build_security_group = code_build_security_group
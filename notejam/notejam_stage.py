@@ -0,0 +1,286 @@
+from aws_cdk.aws_logs import RetentionDays
+from aws_cdk.core import Stage, Stack, Construct, Duration, Tags
+
+from notejam.app_pipeline import AppPipeline, load_test_settings_from_env
+from notejam.cache import Cache
+from notejam.capacity import capacity_profile_from_env
+from notejam.dashboard import NotejamDashboard, alarm_thresholds_from_env
+from notejam.database import Database
+from notejam.edge import Edge
+from notejam.network import Network
+from notejam.service import Service, PRIVATE_ECR_IMAGE
+from notejam.settings import from_env, scaling_schedules_from_env
+from notejam.startup_metrics import TaskStartupMetrics
+
+# image platform built for each CPU_ARCHITECTURE of the tasks
+DOCKER_PLATFORMS = {"X86_64": "linux/amd64", "ARM64": "linux/arm64"}
+
+
+class NotejamStage(Stage):
+    """All the Notejam resources, one stack per layer.
+
+    Layers only reference each other through constructor arguments (CDK generates the exports/imports),
+    so independent stacks (e.g. Data and Cache) are deployed in parallel and unchanged ones are no-ops.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # ==========================================================================================
+        # Inputs
+
+        env = from_env('CDK_ENV_NAME')
+        github_owner = from_env('GITHUB_OWNER')
+        github_repo_app = from_env('GITHUB_REPO_APP')
+        vpc_cidr = from_env('VPC_CIDR')
+        vpc_endpoints = from_env('VPC_ENDPOINTS_ENABLED', False)
+        s3_prefix_list_id = from_env('S3_PREFIX_LIST_ID')
+        capacity = capacity_profile_from_env()
+        cf_static_path_patterns = from_env('CF_STATIC_PATH_PATTERNS', ['*.css'])
+        cf_static_default_ttl = from_env('CF_STATIC_DEFAULT_TTL', 86400)
+        cf_static_max_ttl = from_env('CF_STATIC_MAX_TTL', 31536000)
+        cf_page_default_ttl = from_env('CF_PAGE_DEFAULT_TTL', 0)
+        cf_page_max_ttl = from_env('CF_PAGE_MAX_TTL', 0)
+        cf_page_cache_cookies = from_env('CF_PAGE_CACHE_COOKIES', ['connect.sid'])
+        cf_origin_request_headers = from_env('CF_ORIGIN_REQUEST_HEADERS', ['Host'])
+        cf_additional_metrics = from_env('CF_ADDITIONAL_METRICS', False)
+        cf_origin_keepalive_timeout = from_env('CF_ORIGIN_KEEPALIVE_TIMEOUT', 5)
+        cf_origin_read_timeout = from_env('CF_ORIGIN_READ_TIMEOUT', 30)
+        lb_idle_timeout = from_env('LB_IDLE_TIMEOUT', 60)
+        lb_algorithm = from_env('LB_ALGORITHM', 'round_robin')
+        lb_slow_start = from_env('LB_SLOW_START', 0)
+        health_check_path = from_env('HEALTH_CHECK_PATH', '/signin')
+        health_check_interval = from_env('HEALTH_CHECK_INTERVAL', 30)
+        alarm_thresholds = alarm_thresholds_from_env()
+        redis_maxmemory_policy = from_env('REDIS_MAXMEMORY_POLICY', 'allkeys-lru')
+        redis_reserved_memory_percent = from_env('REDIS_RESERVED_MEMORY_PERCENT', 25)
+        redis_timeout = from_env('REDIS_TIMEOUT', 0)
+        db_replica_target_cpu = from_env('DB_REPLICA_TARGET_CPU', 60)
+        db_replica_target_connections = from_env('DB_REPLICA_TARGET_CONNECTIONS', 30)
+        db_performance_insights = from_env('DB_PERFORMANCE_INSIGHTS', False)
+        db_monitoring_interval = from_env('DB_MONITORING_INTERVAL', 0)
+        db_long_query_time = from_env('DB_LONG_QUERY_TIME', 1.0)
+        db_max_connections = from_env('DB_MAX_CONNECTIONS', 0)
+        db_wait_timeout = from_env('DB_WAIT_TIMEOUT', 28800)
+        db_log_retention = from_env('DB_LOG_RETENTION', RetentionDays.ONE_MONTH)
+        db_proxy_enabled = from_env('DB_PROXY_ENABLED', False)
+        db_proxy_max_connections_percent = from_env('DB_PROXY_MAX_CONNECTIONS_PERCENT', 90)
+        db_proxy_max_idle_connections_percent = from_env('DB_PROXY_MAX_IDLE_CONNECTIONS_PERCENT', 50)
+        db_proxy_idle_client_timeout = from_env('DB_PROXY_IDLE_CLIENT_TIMEOUT', 1800)
+        db_proxy_borrow_timeout = from_env('DB_PROXY_BORROW_TIMEOUT', 120)
+        scaling_target_cpu = from_env('SCALING_TARGET_CPU', 50)
+        scaling_requests_per_target = from_env('SCALING_REQUESTS_PER_TARGET', 1000)
+        scaling_response_time_high = from_env('SCALING_RESPONSE_TIME_HIGH', 0.5)
+        scaling_response_time_critical = from_env('SCALING_RESPONSE_TIME_CRITICAL', 1.0)
+        scaling_scale_in_cooldown = from_env('SCALING_SCALE_IN_COOLDOWN', 300)
+        scaling_scale_out_cooldown = from_env('SCALING_SCALE_OUT_COOLDOWN', 60)
+        scaling_schedules = scaling_schedules_from_env()
+        fargate_base = from_env('FARGATE_BASE', 0)
+        fargate_weight = from_env('FARGATE_WEIGHT', 1)
+        fargate_spot_weight = from_env('FARGATE_SPOT_WEIGHT', 0)
+        cpu_architecture = from_env('CPU_ARCHITECTURE', 'X86_64')
+        if cpu_architecture not in DOCKER_PLATFORMS:
+            raise ValueError(f"Invalid CPU_ARCHITECTURE '{cpu_architecture}', expected X86_64 or ARM64")
+        # only the platform the tasks run on, unless set (e.g. linux/amd64,linux/arm64 while switching)
+        docker_platforms = from_env('DOCKER_PLATFORMS', DOCKER_PLATFORMS[cpu_architecture])
+        test_shards = from_env('TEST_SHARDS', 1)
+        log_driver = from_env('LOG_DRIVER', 'awslogs')
+        log_max_buffer_size = from_env('LOG_MAX_BUFFER_SIZE', '25m')
+        log_retention = from_env('LOG_RETENTION', RetentionDays.ONE_MONTH)
+        tracing_enabled = from_env('TRACING_ENABLED', False)
+        # without a route to the internet (endpoints + S3 prefix list) only private ECR images can be pulled
+        endpoints_only_egress = vpc_endpoints and bool(s3_prefix_list_id)
+        tracing_collector_image = from_env(
+            'TRACING_COLLECTOR_IMAGE',
+            f"{self.account}.dkr.ecr.{self.region}.amazonaws.com/aws-otel-collector:v0.11.0" if endpoints_only_egress
+            else 'public.ecr.aws/aws-observability/aws-otel-collector:v0.11.0')
+        load_test = load_test_settings_from_env()
+        soci_index = from_env('SOCI_INDEX_ENABLED', False)
+        # migration from the single stack layout (see README), keep them set once the stacks exist
+        db_snapshot_identifier = from_env('DB_SNAPSHOT_IDENTIFIER')
+        redis_snapshot_name = from_env('REDIS_SNAPSHOT_NAME')
+        ecr_repository_name = from_env('ECR_REPOSITORY_NAME')
+
+        if cf_origin_keepalive_timeout >= lb_idle_timeout:
+            raise ValueError("CF_ORIGIN_KEEPALIVE_TIMEOUT must be lower than LB_IDLE_TIMEOUT")
+        if tracing_enabled and endpoints_only_egress and not PRIVATE_ECR_IMAGE.match(tracing_collector_image):
+            raise ValueError(f"TRACING_COLLECTOR_IMAGE '{tracing_collector_image}' can't be pulled with "
+                             "VPC_ENDPOINTS_ENABLED and S3_PREFIX_LIST_ID, expected a private ECR image "
+                             "(<account>.dkr.ecr.<region>.amazonaws.com/<repository>)")
+
+        # Tags applied on the pipeline stack (app.py) do not cross the Stage boundary
+        Tags.of(self).add("Environment", env)
+        Tags.of(self).add("CDK-App", "Notejam")
+
+        # ==========================================================================================
+        # Network Stack: VPC & app tier Security Groups
+
+        network_stack = Stack(self, "Network", stack_name=f"notejam-{env}-network")
+
+        network = Network(
+            network_stack, "Network",
+            vpc_cidr=vpc_cidr,
+            nat_gateways=capacity.nat_gateways,
+            vpc_endpoints=vpc_endpoints,
+            s3_prefix_list_id=s3_prefix_list_id,
+            tracing=tracing_enabled
+        )
+
+        # ==========================================================================================
+        # Data Stack: Aurora
+
+        data_stack = Stack(self, "Data", stack_name=f"notejam-{env}-data")
+
+        database = Database(
+            data_stack, "Aurora",
+            env=env,
+            vpc=network.vpc,
+            app_security_group=network.fargate_security_group,
+            migrations_security_group=network.code_build_security_group,
+            instance_type=capacity.db_instance_type,
+            instances=capacity.db_instances,
+            replica_min_capacity=capacity.db_replica_min_capacity,
+            replica_max_capacity=capacity.db_replica_max_capacity,
+            replica_target_cpu=db_replica_target_cpu,
+            replica_target_connections=db_replica_target_connections,
+            proxy_enabled=db_proxy_enabled,
+            proxy_max_connections_percent=db_proxy_max_connections_percent,
+            proxy_max_idle_connections_percent=db_proxy_max_idle_connections_percent,
+            proxy_idle_client_timeout=Duration.seconds(db_proxy_idle_client_timeout),
+            proxy_borrow_timeout=Duration.seconds(db_proxy_borrow_timeout),
+            performance_insights=db_performance_insights,
+            monitoring_interval=Duration.seconds(db_monitoring_interval) if db_monitoring_interval else None,
+            long_query_time=db_long_query_time,
+            max_connections=db_max_connections or None,
+            wait_timeout=db_wait_timeout,
+            log_retention=db_log_retention,
+            snapshot_identifier=db_snapshot_identifier
+        )
+
+        # ==========================================================================================
+        # Cache Stack: ElastiCache - Redis
+
+        cache_stack = Stack(self, "Cache", stack_name=f"notejam-{env}-cache")
+
+        cache = Cache(
+            cache_stack, "Redis",
+            vpc=network.vpc,
+            app_security_group=network.fargate_security_group,
+            node_type=capacity.redis_node_type,
+            num_cache_clusters=capacity.redis_num_cache_clusters,
+            num_node_groups=capacity.redis_num_node_groups,
+            replicas_per_node_group=capacity.redis_replicas_per_node_group,
+            maxmemory_policy=redis_maxmemory_policy,
+            reserved_memory_percent=redis_reserved_memory_percent,
+            timeout=redis_timeout,
+            snapshot_name=redis_snapshot_name
+        )
+
+        # ==========================================================================================
+        # Service Stack: ALB, ECR & ECS
+
+        service_stack = Stack(self, "Service", stack_name=f"notejam-{env}-service")
+
+        service = Service(
+            service_stack, "App",
+            env=env,
+            vpc=network.vpc,
+            security_group=network.fargate_security_group,
+            lb_security_group=network.lb_security_group,
+            capacity=capacity,
+            container_environment={
+                **cache.container_environment,
+                **database.container_environment
+            },
+            container_secrets=database.container_secrets,
+            cpu_architecture=cpu_architecture,
+            fargate_base=fargate_base,
+            fargate_weight=fargate_weight,
+            fargate_spot_weight=fargate_spot_weight,
+            scaling_target_cpu=scaling_target_cpu,
+            scaling_requests_per_target=scaling_requests_per_target,
+            scaling_response_time_high=scaling_response_time_high,
+            scaling_response_time_critical=scaling_response_time_critical,
+            scale_in_cooldown=Duration.seconds(scaling_scale_in_cooldown),
+            scale_out_cooldown=Duration.seconds(scaling_scale_out_cooldown),
+            scaling_schedules=scaling_schedules,
+            lb_idle_timeout=Duration.seconds(lb_idle_timeout),
+            lb_algorithm=lb_algorithm,
+            lb_slow_start=Duration.seconds(lb_slow_start) if lb_slow_start else None,
+            health_check_path=health_check_path,
+            health_check_interval=Duration.seconds(health_check_interval),
+            log_driver=log_driver,
+            log_max_buffer_size=log_max_buffer_size,
+            log_retention=log_retention,
+            tracing_collector_image=tracing_collector_image if tracing_enabled else None,
+            ecr_repository_name=ecr_repository_name
+        )
+
+        # ==========================================================================================
+        # Edge Stack: CloudFront
+
+        edge_stack = Stack(self, "Edge", stack_name=f"notejam-{env}-edge")
+
+        edge = Edge(
+            edge_stack, "CloudFront",
+            env=env,
+            load_balancer=service.load_balancer,
+            static_path_patterns=cf_static_path_patterns,
+            static_default_ttl=Duration.seconds(cf_static_default_ttl),
+            static_max_ttl=Duration.seconds(cf_static_max_ttl),
+            page_default_ttl=Duration.seconds(cf_page_default_ttl),
+            page_max_ttl=Duration.seconds(cf_page_max_ttl),
+            page_cache_cookies=cf_page_cache_cookies,
+            origin_request_headers=cf_origin_request_headers,
+            additional_metrics=cf_additional_metrics,
+            origin_keepalive_timeout=Duration.seconds(cf_origin_keepalive_timeout),
+            origin_read_timeout=Duration.seconds(cf_origin_read_timeout),
+            trace_headers=tracing_enabled
+        )
+
+        # ==========================================================================================
+        # Monitoring Stack: CloudWatch - Dashboard & Alarms
+
+        monitoring_stack = Stack(self, "Monitoring", stack_name=f"notejam-{env}-monitoring")
+
+        startup_metrics = TaskStartupMetrics(
+            monitoring_stack, "TaskStartup",
+            service=service.service,
+            log_retention=log_retention
+        )
+
+        NotejamDashboard(
+            monitoring_stack, "Monitoring",
+            load_balancer=service.load_balancer,
+            target_group=service.target_group,
+            service=service.service,
+            database=database.cluster,
+            redis_nodes=cache.node_ids,
+            distribution=edge.distribution,
+            thresholds=alarm_thresholds,
+            startup_metrics=list(startup_metrics.metrics.values())
+        )
+
+        # ==========================================================================================
+        # App Pipeline Stack: CI/CD Pipeline for Notejam App
+
+        app_pipeline_stack = Stack(self, "AppPipeline", stack_name=f"notejam-{env}-app-pipeline")
+
+        AppPipeline(
+            app_pipeline_stack, "Notejam",
+            env=env,
+            github_owner=github_owner,
+            github_repo_app=github_repo_app,
+            ecr_repo=service.ecr_repo,
+            service=service.service,
+            vpc=network.vpc,
+            security_group=network.code_build_security_group,
+            db_secret=database.secret,
+            docker_platforms=docker_platforms,
+            test_shards=test_shards,
+            soci_index=soci_index,
+            tracing_collector_image=tracing_collector_image if tracing_enabled else None,
+            load_balancer_dns_name=service.load_balancer.load_balancer_dns_name,
+            load_test=load_test,
+            log_retention=log_retention
+        )
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from aws_cdk.aws_cloudwatch import Metric
+from aws_cdk.aws_codepipeline import Pipeline
+from aws_cdk.aws_events import Rule, EventPattern
+from aws_cdk.aws_events_targets import LambdaFunction
+from aws_cdk.aws_iam import PolicyStatement
+from aws_cdk.aws_lambda import Function, Code
+from aws_cdk.aws_logs import LogGroup, RetentionDays
+from aws_cdk.core import Construct, Duration, RemovalPolicy
+
+from notejam.startup_metrics import PYTHON_3_12
+
+HANDLER = Path(__file__).parent / "functions" / "pipeline_metrics.py"
+NAMESPACE = "Notejam/CodePipeline"
+
+
+class PipelineMetrics(Construct):
+    """Duration of every finished action (``ActionDuration``) and of every successful pipeline execution
+    (``PipelineDuration``, commit to prod) published as ``Notejam/CodePipeline`` metrics.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 pipeline: Pipeline,
+                 log_retention: RetentionDays = RetentionDays.ONE_MONTH) -> None:
+        super().__init__(scope, construct_id)
+
+        function = Function(
+            self, "Function",
+            runtime=PYTHON_3_12,
+            handler="index.handler",
+            code=Code.from_inline(HANDLER.read_text()),
+            memory_size=128,
+            timeout=Duration.seconds(30),
+            description="CodePipeline action & execution durations -> CloudWatch metrics"
+        )
+        # before the rule can invoke the function (see TaskStartupMetrics)
+        log_group = LogGroup(
+            self, "Logs",
+            log_group_name=f"/aws/lambda/{function.function_name}",
+            retention=log_retention,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+        # the state change events only carry the end time, the start time comes from the executions history
+        function.add_to_role_policy(PolicyStatement(
+            actions=["codepipeline:ListActionExecutions", "codepipeline:ListPipelineExecutions"],
+            resources=[pipeline.pipeline_arn]
+        ))
+
+        rule = Rule(
+            self, "ExecutionFinished",
+            event_pattern=EventPattern(
+                source=["aws.codepipeline"],
+                detail_type=[
+                    "CodePipeline Action Execution State Change",
+                    "CodePipeline Pipeline Execution State Change"
+                ],
+                detail={
+                    "pipeline": [pipeline.pipeline_name],
+                    "state": ["SUCCEEDED", "FAILED"]
+                }
+            ),
+            targets=[LambdaFunction(function)]
+        )
+        rule.node.add_dependency(log_group)
+
+        self.pipeline_duration = Metric(
+            namespace=NAMESPACE,
+            metric_name="PipelineDuration",
+            dimensions={"PipelineName": pipeline.pipeline_name},
+            statistic="p90",
+            period=Duration.days(1),
+            label="PipelineDuration"
+        )
@@ -0,0 +1,339 @@
+import re
+from typing import Mapping, Sequence, Tuple
+
+from aws_cdk.aws_applicationautoscaling import ScalingInterval, AdjustmentType, Schedule
+from aws_cdk.aws_ec2 import IVpc, ISecurityGroup, SubnetSelection
+from aws_cdk.aws_ecs import Cluster, ContainerImage, TaskDefinition, NetworkMode, Compatibility, PortMapping, Secret, \
+    FargateService, LogDrivers, CapacityProviderStrategy, CfnTaskDefinition, HealthCheck as ContainerHealthCheck, \
+    FirelensConfig, FirelensLogRouterType, AwsLogDriverMode
+from aws_cdk.aws_ecr import Repository
+from aws_cdk.aws_elasticloadbalancingv2 import ApplicationLoadBalancer, ApplicationProtocol, HealthCheck
+from aws_cdk.aws_iam import PolicyStatement, ManagedPolicy
+from aws_cdk.aws_logs import LogGroup, RetentionDays
+from aws_cdk.aws_ssm import StringParameter
+from aws_cdk.core import Construct, RemovalPolicy, Duration, Stack
+
+from notejam.capacity import CapacityProfile
+from notejam.tracing import COLLECTOR_CONFIG
+
+# <account>.dkr.ecr.<region>.amazonaws.com/<repository>[:<tag>|@<digest>]
+PRIVATE_ECR_IMAGE = re.compile(r"^(\d{12})\.dkr\.ecr\.([a-z0-9-]+)\.amazonaws\.com/([^:@]+)")
+
+
+class Service(Construct):
+    """ECR repo, ECS Cluster, Fargate Service behind an Application Load Balancer and its auto scaling."""
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 env: str,
+                 vpc: IVpc,
+                 security_group: ISecurityGroup,
+                 lb_security_group: ISecurityGroup,
+                 capacity: CapacityProfile,
+                 container_environment: Mapping[str, str],
+                 container_secrets: Mapping[str, Secret],
+                 cpu_architecture: str,
+                 fargate_base: int,
+                 fargate_weight: int,
+                 fargate_spot_weight: int,
+                 scaling_target_cpu: int,
+                 scaling_requests_per_target: int,
+                 scaling_response_time_high: float,
+                 scaling_response_time_critical: float,
+                 scale_in_cooldown: Duration,
+                 scale_out_cooldown: Duration,
+                 scaling_schedules: Sequence[Tuple[str, int, int]],
+                 lb_idle_timeout: Duration = Duration.seconds(60),
+                 lb_algorithm: str = "round_robin",
+                 lb_slow_start: Duration = None,
+                 health_check_path: str = "/signin",
+                 health_check_interval: Duration = Duration.seconds(30),
+                 log_driver: str = "awslogs",
+                 log_max_buffer_size: str = "25m",
+                 log_retention: RetentionDays = RetentionDays.ONE_MONTH,
+                 tracing_collector_image: str = None,
+                 ecr_repository_name: str = None) -> None:
+        super().__init__(scope, construct_id)
+
+        if log_driver not in ("awslogs", "firelens"):
+            raise ValueError(f"Invalid LOG_DRIVER '{log_driver}', expected awslogs or firelens")
+
+        if lb_algorithm not in ("round_robin", "least_outstanding_requests"):
+            raise ValueError(f"Invalid LB_ALGORITHM '{lb_algorithm}', expected round_robin or least_outstanding_requests")
+        # the target group rejects slow start together with least outstanding requests
+        if lb_slow_start and lb_algorithm == "least_outstanding_requests":
+            raise ValueError("LB_SLOW_START is not supported with LB_ALGORITHM=least_outstanding_requests")
+        # Fargate Spot only runs X86_64 Linux tasks
+        if fargate_spot_weight > 0 and cpu_architecture == "ARM64":
+            raise ValueError("FARGATE_SPOT_WEIGHT must be 0 with CPU_ARCHITECTURE=ARM64 (no Fargate Spot on ARM64)")
+        # without Spot there is no capacity provider strategy (the launch type is FARGATE)
+        if fargate_spot_weight == 0 and (fargate_base, fargate_weight) != (0, 1):
+            raise ValueError("FARGATE_BASE and FARGATE_WEIGHT are only used with FARGATE_SPOT_WEIGHT > 0")
+
+        # ==========================================================================================
+        # Application Load Balancer
+
+        lb = ApplicationLoadBalancer(
+            self, "LB",
+            vpc=vpc,
+            internet_facing=True,
+            security_group=lb_security_group,
+            idle_timeout=lb_idle_timeout
+        )
+        listener = lb.add_listener("Listener", port=80)
+
+        # ==========================================================================================
+        # ECR
+
+        # an existing repository (ecr_repository_name) keeps its images and lifecycle rules
+        if ecr_repository_name:
+            ecr_repo = Repository.from_repository_name(self, "EcrRepo", ecr_repository_name)
+        else:
+            ecr_repo = Repository(self, "EcrRepo", removal_policy=RemovalPolicy.RETAIN)
+            ecr_repo.add_lifecycle_rule(tag_prefix_list=[env], max_image_count=10)
+
+        # ==========================================================================================
+        # ECS
+
+        cluster = Cluster(self, "Cluster", vpc=vpc, enable_fargate_capacity_providers=True)
+
+        # ==========================================================================================
+        # ECS - Task Definition
+
+        task_definition = TaskDefinition(
+            self, "TaskDef",
+            memory_mib=str(capacity.task_memory),
+            cpu=str(capacity.task_cpu),
+            network_mode=NetworkMode.AWS_VPC,
+            compatibility=Compatibility.FARGATE if cpu_architecture == "ARM64" else Compatibility.EC2_AND_FARGATE
+        )
+
+        # RuntimePlatform is not exposed by the L2 TaskDefinition yet
+        cfn_task_definition: CfnTaskDefinition = task_definition.node.default_child
+        cfn_task_definition.add_property_override("RuntimePlatform", {
+            "CpuArchitecture": cpu_architecture,
+            "OperatingSystemFamily": "LINUX"
+        })
+
+        # ==========================================================================================
+        # ECS - Logging
+
+        log_group = LogGroup(
+            self, "Logs",
+            retention=log_retention,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+
+        # Logs never block the event loop: awslogs in non-blocking mode drops lines once max-buffer-size is full,
+        # FireLens hands them over to a Fluent Bit sidecar that batches the PutLogEvents calls
+        if log_driver == "firelens":
+            logging = LogDrivers.firelens(options={
+                "Name": "cloudwatch_logs",
+                "region": Stack.of(self).region,
+                "log_group_name": log_group.log_group_name,
+                "log_stream_prefix": "Notejam/",
+                "auto_create_group": "false",
+            })
+            log_group.grant_write(task_definition.task_role)
+        else:
+            logging = LogDrivers.aws_logs(
+                stream_prefix="Notejam",
+                log_group=log_group,
+                mode=AwsLogDriverMode.NON_BLOCKING
+            )
+
+        # the containers of an awsvpc task share localhost
+        tracing_environment = {
+            "OTEL_SERVICE_NAME": f"notejam-{env}",
+            "OTEL_EXPORTER_OTLP_ENDPOINT": "http://localhost:4317",
+            "OTEL_PROPAGATORS": "xray,tracecontext",
+            "AWS_XRAY_DAEMON_ADDRESS": "localhost:2000",
+        }
+
+        container = task_definition.add_container(
+            "notejam",
+            image=ContainerImage.from_ecr_repository(ecr_repo, "latest"),
+            memory_reservation_mib=capacity.container_memory_reservation,
+            logging=logging,
+            environment={
+                "NODE_ENV": env,
+                **container_environment,
+                **(tracing_environment if tracing_collector_image else {})
+            },
+            secrets=dict(container_secrets),
+            # node is the only tool guaranteed in the image; HEALTHY feeds the TimeToHealthy startup metric
+            health_check=ContainerHealthCheck(
+                command=["CMD-SHELL", "node -e \"require('http').get('http://localhost:3000" + health_check_path +
+                         "', r => process.exit(r.statusCode < 400 ? 0 : 1)).on('error', () => process.exit(1))\""],
+                interval=Duration.seconds(10),
+                timeout=Duration.seconds(5),
+                retries=3,
+                start_period=Duration.seconds(60)
+            )
+        )
+
+        container.add_port_mappings(PortMapping(container_port=3000))
+
+        # one entry per container, in ContainerDefinitions order: does it log with awslogs?
+        awslogs_containers = [log_driver == "awslogs"]
+
+        # added after the app container, which must stay the default (load balanced) container
+        if log_driver == "firelens":
+            # AWS for Fluent Bit from its regional ECR repo (reachable through the ECR VPC endpoints)
+            fluent_bit_image = StringParameter.value_for_string_parameter(
+                self, "/aws/service/aws-for-fluent-bit/stable")
+            task_definition.add_to_execution_role_policy(PolicyStatement(
+                actions=["ecr:BatchGetImage", "ecr:GetDownloadUrlForLayer"],
+                resources=[f"arn:aws:ecr:{Stack.of(self).region}:*:repository/aws-for-fluent-bit"]
+            ))
+            task_definition.add_firelens_log_router(
+                "LogRouter",
+                firelens_config=FirelensConfig(type=FirelensLogRouterType.FLUENTBIT),
+                image=ContainerImage.from_registry(fluent_bit_image),
+                memory_reservation_mib=50,
+                essential=True,
+                logging=LogDrivers.aws_logs(
+                    stream_prefix="FireLens",
+                    log_group=log_group,
+                    mode=AwsLogDriverMode.NON_BLOCKING
+                )
+            )
+            awslogs_containers.append(True)
+
+        # ==========================================================================================
+        # ECS - Tracing
+
+        # OpenTelemetry Collector (ADOT) sidecar: OTLP and X-Ray daemon protocol in, X-Ray out.
+        # Not essential, a collector failure only loses traces.
+        if tracing_collector_image:
+            # a private ECR copy of the image is pulled through the ECR VPC endpoints, like the app image
+            private_collector_image = PRIVATE_ECR_IMAGE.match(tracing_collector_image)
+            if private_collector_image:
+                account, region, repository = private_collector_image.groups()
+                task_definition.add_to_execution_role_policy(PolicyStatement(
+                    actions=["ecr:BatchGetImage", "ecr:GetDownloadUrlForLayer"],
+                    resources=[f"arn:aws:ecr:{region}:{account}:repository/{repository}"]
+                ))
+            task_definition.add_container(
+                "otel-collector",
+                image=ContainerImage.from_registry(tracing_collector_image),
+                memory_reservation_mib=64,
+                essential=False,
+                environment={
+                    "AOT_CONFIG_CONTENT": COLLECTOR_CONFIG
+                },
+                logging=LogDrivers.aws_logs(
+                    stream_prefix="Collector",
+                    log_group=log_group,
+                    mode=AwsLogDriverMode.NON_BLOCKING
+                )
+            )
+            awslogs_containers.append(True)
+            task_definition.task_role.add_managed_policy(
+                ManagedPolicy.from_aws_managed_policy_name("AWSXRayDaemonWriteAccess")
+            )
+
+        # AwsLogDriver has no max-buffer-size option yet: set it on the containers that log with awslogs
+        for index, awslogs in enumerate(awslogs_containers):
+            if awslogs:
+                cfn_task_definition.add_property_override(
+                    f"ContainerDefinitions.{index}.LogConfiguration.Options.max-buffer-size",
+                    log_max_buffer_size
+                )
+
+        # ==========================================================================================
+        # ECS - Service
+
+        # Without Spot the service keeps the plain FARGATE launch type
+        capacity_provider_strategies = None
+        if fargate_spot_weight > 0:
+            capacity_provider_strategies = [
+                CapacityProviderStrategy(
+                    capacity_provider="FARGATE",
+                    base=fargate_base,
+                    weight=fargate_weight
+                ),
+                CapacityProviderStrategy(
+                    capacity_provider="FARGATE_SPOT",
+                    weight=fargate_spot_weight
+                )
+            ]
+
+        service = FargateService(
+            self, "Service",
+            cluster=cluster,
+            task_definition=task_definition,
+            capacity_provider_strategies=capacity_provider_strategies,
+            desired_count=capacity.desired_capacity,
+            health_check_grace_period=Duration.seconds(3),
+            vpc_subnets=SubnetSelection(subnet_group_name="Application"),
+            security_group=security_group,
+            min_healthy_percent=100,
+            max_healthy_percent=200
+        )
+
+        target_group = listener.add_targets(
+            "Fargate",
+            port=3000,
+            protocol=ApplicationProtocol.HTTP,
+            health_check=HealthCheck(
+                path=health_check_path,
+                interval=health_check_interval,
+                healthy_threshold_count=2
+            ),
+            deregistration_delay=Duration.seconds(10),
+            slow_start=lb_slow_start,
+            targets=[service]
+        )
+        target_group.set_attribute("load_balancing.algorithm.type", lb_algorithm)
+
+        # ==========================================================================================
+        # ECS - Application Auto Scaling
+
+        scaling = service.auto_scale_task_count(
+            min_capacity=capacity.min_capacity,
+            max_capacity=capacity.max_capacity
+        )
+        scaling.scale_on_cpu_utilization(
+            "CpuScaling",
+            target_utilization_percent=scaling_target_cpu,
+            scale_in_cooldown=scale_in_cooldown,
+            scale_out_cooldown=scale_out_cooldown
+        )
+        scaling.scale_on_request_count(
+            "RequestScaling",
+            requests_per_target=scaling_requests_per_target,
+            target_group=target_group,
+            scale_in_cooldown=scale_in_cooldown,
+            scale_out_cooldown=scale_out_cooldown
+        )
+
+        # Step scaling on p95 latency: Node is I/O-bound, so latency saturates before CPU does.
+        # Scale out only: a low latency alarm would stay in ALARM most of the time and remove a task after
+        # every cooldown, fighting the target tracking policies, which already scale in
+        scaling.scale_on_metric(
+            "ResponseTimeScaling",
+            metric=target_group.metric_target_response_time(statistic="p95", period=Duration.minutes(1)),
+            adjustment_type=AdjustmentType.CHANGE_IN_CAPACITY,
+            cooldown=scale_out_cooldown,
+            scaling_steps=[
+                ScalingInterval(lower=scaling_response_time_high, change=+1),
+                ScalingInterval(lower=scaling_response_time_critical, change=+3),
+            ]
+        )
+
+        # Scheduled scaling for known peaks
+        for index, (expression, schedule_min_capacity, schedule_max_capacity) in enumerate(scaling_schedules):
+            scaling.scale_on_schedule(
+                f"Schedule{index}",
+                schedule=Schedule.expression(expression),
+                min_capacity=schedule_min_capacity,
+                max_capacity=schedule_max_capacity
+            )
+
+        self.load_balancer = lb
+        self.target_group = target_group
+        self.ecr_repo = ecr_repo
+        self.task_definition = task_definition
+        self.container = container
+        self.log_group = log_group
+        self.service = service
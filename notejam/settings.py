@@ -0,0 +1,62 @@
+import os
+from enum import Enum
+from typing import Any, List, Mapping, NamedTuple, Tuple, TypeVar
+
+Settings = TypeVar("Settings", bound=NamedTuple)
+
+
+def _convert(value: str, default: Any) -> Any:
+    if default is None or isinstance(default, str):
+        return value
+    if isinstance(default, bool):
+        if value not in ("true", "false"):
+            raise ValueError(value)
+        return value == "true"
+    if isinstance(default, list):
+        return value.split(",")
+    if isinstance(default, Enum):
+        try:
+            return type(default)[value]
+        except KeyError:
+            raise ValueError(value) from None
+    return type(default)(value)
+
+
+def from_env(name: str, default: Any = None, environ: Mapping[str, str] = os.environ) -> Any:
+    """Env var ``name`` converted to the type of ``default`` (bool: true|false, list: comma separated,
+    Enum: member name), or ``default`` when unset or empty."""
+
+    value = environ.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return _convert(value, default)
+    except ValueError:
+        raise ValueError(f"Invalid value for {name}: '{value}'") from None
+
+
+def settings_from_env(settings: Settings, prefix: str = "", environ: Mapping[str, str] = os.environ) -> Settings:
+    """``settings`` with each field overridden by its ``<prefix><FIELD>`` env var (see ``from_env``)."""
+
+    return settings._replace(**{
+        field: from_env(f"{prefix}{field.upper()}", default, environ)
+        for field, default in settings._asdict().items()
+    })
+
+
+def scaling_schedules_from_env(environ: Mapping[str, str] = os.environ) -> List[Tuple[str, int, int]]:
+    """SCALING_SCHEDULES, format: ``<cron|rate expression>|<min>|<max>;...``"""
+
+    schedules = []
+    for scaling_schedule in filter(None, from_env("SCALING_SCHEDULES", "", environ).split(";")):
+        parts = scaling_schedule.split("|")
+        try:
+            expression, min_capacity, max_capacity = parts[0], int(parts[1]), int(parts[2])
+            if len(parts) != 3 or not expression or not 0 <= min_capacity <= max_capacity:
+                raise ValueError
+        except (IndexError, ValueError):
+            raise ValueError(f"Invalid SCALING_SCHEDULES entry '{scaling_schedule}', "
+                             "expected '<cron|rate expression>|<min>|<max>' with min <= max") from None
+        schedules.append((expression, min_capacity, max_capacity))
+
+    return schedules
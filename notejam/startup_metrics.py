@@ -0,0 +1,87 @@
+from pathlib import Path
+
+from aws_cdk.aws_cloudwatch import Metric
+from aws_cdk.aws_dynamodb import Table, Attribute, AttributeType, BillingMode
+from aws_cdk.aws_ecs import FargateService
+from aws_cdk.aws_events import Rule, EventPattern
+from aws_cdk.aws_events_targets import LambdaFunction
+from aws_cdk.aws_lambda import Function, Code, Runtime, RuntimeFamily
+from aws_cdk.aws_logs import LogGroup, RetentionDays
+from aws_cdk.core import Construct, Duration, RemovalPolicy
+
+HANDLER = Path(__file__).parent / "functions" / "task_startup_metrics.py"
+# no constant for it in this CDK version
+PYTHON_3_12 = Runtime("python3.12", RuntimeFamily.PYTHON, supports_inline_code=True)
+NAMESPACE = "Notejam/ECS"
+PHASES = ["ProvisioningTime", "ImagePullTime", "ContainerStartTime", "TimeToHealthy", "TaskStartupTime"]
+
+
+class TaskStartupMetrics(Construct):
+    """Startup phases of every Fargate task (provisioning, image pull, container start, first healthy)
+    published as ``Notejam/ECS`` metrics from the ECS Task State Change events.
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, *,
+                 service: FargateService,
+                 log_retention: RetentionDays = RetentionDays.ONE_MONTH) -> None:
+        super().__init__(scope, construct_id)
+
+        # tasks already counted (ECS sends several HEALTHY events per task), kept for a day
+        tasks = Table(
+            self, "Tasks",
+            partition_key=Attribute(name="taskArn", type=AttributeType.STRING),
+            billing_mode=BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expiresAt",
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
+        function = Function(
+            self, "Function",
+            runtime=PYTHON_3_12,
+            handler="index.handler",
+            code=Code.from_inline(HANDLER.read_text()),
+            memory_size=128,
+            timeout=Duration.seconds(10),
+            environment={
+                "TABLE_NAME": tasks.table_name
+            },
+            description="ECS task startup phases -> CloudWatch metrics"
+        )
+        tasks.grant_write_data(function)
+        # the log group Lambda would create on its own never expires (log_retention needs a Node.js custom resource).
+        # It must exist before the rule can invoke the function, else Lambda creates it first and the stack update
+        # fails (the function itself can't depend on it: the log group name refers to the function).
+        log_group = LogGroup(
+            self, "Logs",
+            log_group_name=f"/aws/lambda/{function.function_name}",
+            retention=log_retention,
+            removal_policy=RemovalPolicy.RETAIN
+        )
+
+        rule = Rule(
+            self, "TaskRunning",
+            event_pattern=EventPattern(
+                source=["aws.ecs"],
+                detail_type=["ECS Task State Change"],
+                detail={
+                    "clusterArn": [service.cluster.cluster_arn],
+                    "group": [f"service:{service.service_name}"],
+                    "lastStatus": ["RUNNING"],
+                    "desiredStatus": ["RUNNING"],
+                    "healthStatus": ["HEALTHY"]
+                }
+            ),
+            targets=[LambdaFunction(function)]
+        )
+        rule.node.add_dependency(log_group)
+
+        self.metrics = {
+            phase: Metric(
+                namespace=NAMESPACE,
+                metric_name=phase,
+                dimensions={"ServiceName": service.service_name},
+                statistic="p90",
+                period=Duration.minutes(5),
+                label=phase
+            ) for phase in PHASES
+        }
@@ -0,0 +1,3 @@
+from pathlib import Path
+
+MOCHA_SHARD_SCRIPT = (Path(__file__).parent / "mocha-shard.js").read_text()
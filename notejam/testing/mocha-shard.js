@@ -0,0 +1,52 @@
+// Prints the mocha arguments of one test shard, run from the app directory of the image:
+// the options of the `npm test` script (and .mocharc) are kept, its spec is resolved to the test files
+// mocha would load (not helpers / fixtures) and every TEST_SHARDS-th file goes to shard TEST_SHARD.
+// Prints nothing when the shard has no files, so that the caller can skip it.
+const path = require('path');
+
+const fromApp = (module) => require(require.resolve(module, {paths: [process.cwd()]}));
+
+const {loadOptions} = fromApp('mocha/lib/cli/options');
+let lookupFiles;
+try {
+  lookupFiles = fromApp('mocha/lib/cli/lookup-files');
+} catch (e) {
+  lookupFiles = fromApp('mocha/lib/utils').lookupFiles;
+}
+
+const script = (require(path.resolve('package.json')).scripts || {}).test || '';
+const tokens = script.split(/\s+/).map((token) => token.replace(/^['"]|['"]$/g, ''));
+const mochaIndex = tokens.findIndex((token) => /(^|\/)_?mocha$/.test(token));
+const argv = mochaIndex < 0 ? [] : tokens.slice(mochaIndex + 1).filter(Boolean);
+
+const options = loadOptions(argv);
+const specs = [].concat(options._ || [], options.spec || []);
+const extensions = options.extension || ['js'];
+
+const files = [...new Set(
+  specs.flatMap((spec) => lookupFiles(spec, extensions, options.recursive))
+    .map((file) => path.relative(process.cwd(), path.resolve(file)))
+)].sort();
+
+const shards = Number(process.env.TEST_SHARDS || 1);
+const shard = Number(process.env.TEST_SHARD || 0);
+const shardFiles = files.filter((file, index) => index % shards === shard);
+if (shardFiles.length === 0) {
+  process.exit(0);
+}
+
+// drop the spec (replaced by the shard files), the reporter and --exit (set by the caller)
+const dropWithValue = ['--spec', '--reporter', '-R', '--reporter-option', '--reporter-options', '-O'];
+const drop = ['--exit'];
+const positional = new Set(specs.map(String));
+const kept = [];
+for (let i = 0; i < argv.length; i++) {
+  const [flag] = argv[i].split('=');
+  if (dropWithValue.includes(flag)) {
+    if (!argv[i].includes('=')) i++;
+  } else if (!drop.includes(flag) && !positional.has(argv[i])) {
+    kept.push(argv[i]);
+  }
+}
+
+console.log([...kept, ...shardFiles].join(' '));
@@ -0,0 +1,4 @@
+from pathlib import Path
+
+COLLECTOR_CONFIG = (Path(__file__).parent / "otel-collector.yaml").read_text()
+COLLECTOR_LOCAL_CONFIG = (Path(__file__).parent / "otel-collector-local.yaml").read_text()
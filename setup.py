@@ -20,18 +20,26 @@ setuptools.setup(
 
     install_requires=[
         "aws-cdk.core==1.106.1",
+        "aws-cdk.aws-applicationautoscaling==1.106.1",
         "aws-cdk.aws-cloudfront==1.106.1",
         "aws-cdk.aws-cloudfront-origins==1.106.1",
+        "aws-cdk.aws-cloudwatch==1.106.1",
         "aws-cdk.aws-codebuild==1.106.1",
         "aws-cdk.aws-codepipeline==1.106.1",
         "aws-cdk.aws-codepipeline-actions==1.106.1",
+        "aws-cdk.aws-dynamodb==1.106.1",
         "aws-cdk.aws-ec2==1.106.1",
         "aws-cdk.aws-ecr==1.106.1",
         "aws-cdk.aws-ecs==1.106.1",
         "aws-cdk.aws-elasticache==1.106.1",
         "aws-cdk.aws-elasticloadbalancingv2==1.106.1",
+        "aws-cdk.aws-events==1.106.1",
+        "aws-cdk.aws-events-targets==1.106.1",
         "aws-cdk.aws-iam==1.106.1",
+        "aws-cdk.aws-lambda==1.106.1",
+        "aws-cdk.aws-logs==1.106.1",
         "aws-cdk.aws-rds==1.106.1",
+        "aws-cdk.aws-ssm==1.106.1",
         "aws-cdk.pipelines==1.106.1",
     ],
 
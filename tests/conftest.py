@@ -0,0 +1,100 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import NamedTuple, Dict
+from unittest import mock
+
+import pytest
+from aws_cdk import core
+
+from notejam.notejam_stack import NotejamStack
+
+ROOT = Path(__file__).parent.parent
+
+ENVIRONMENTS = ["dev", "prod"]
+
+
+class Synth(NamedTuple):
+    env: str
+    environ: Dict[str, str]
+    templates: Dict[str, dict]
+    duration: float
+    outdir: Path
+
+    def template(self, layer: str = None) -> dict:
+        """Template of ``notejam-<env>-<layer>`` (or of the pipeline stack ``notejam-<env>``)."""
+        return self.templates[f"notejam-{self.env}-{layer}" if layer else f"notejam-{self.env}"]
+
+    def resources(self, layer: str, resource_type: str) -> Dict[str, dict]:
+        return {
+            logical_id: resource.get("Properties", {})
+            for logical_id, resource in self.template(layer)["Resources"].items()
+            if resource["Type"] == resource_type
+        }
+
+
+def read_env_file(env: str) -> Dict[str, str]:
+    """Same values ``cdk-ctl.sh`` exports with ``set -a; source cdk.<env>.env``."""
+    environ = {}
+    for line in (ROOT / f"cdk.{env}.env").read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, value = line.split("=", 1)
+        environ[key] = value.strip('"').strip("'")
+    return environ
+
+
+def read_context() -> dict:
+    """cdk.json context + cached lookups (cdk.context.json), so that synth never calls AWS."""
+    context = json.loads((ROOT / "cdk.json").read_text())["context"]
+    context.update(json.loads((ROOT / "cdk.context.json").read_text()))
+    return context
+
+
+def read_templates(outdir: Path) -> Dict[str, dict]:
+    templates = {}
+    for manifest_file in outdir.rglob("manifest.json"):
+        manifest = json.loads(manifest_file.read_text())
+        for artifact_id, artifact in manifest["artifacts"].items():
+            if artifact["type"] != "aws:cloudformation:stack":
+                continue
+            stack_name = artifact["properties"].get("stackName", artifact_id)
+            template_file = manifest_file.parent / artifact["properties"]["templateFile"]
+            templates[stack_name] = json.loads(template_file.read_text())
+    return templates
+
+
+def synth(env: str, outdir: Path, **overrides: str) -> Synth:
+    environ = {**read_env_file(env), **overrides}
+    with mock.patch.dict(os.environ, environ):
+        start = time.perf_counter()
+        app = core.App(context=read_context(), outdir=str(outdir))
+        NotejamStack(
+            app, f"notejam-{env}",
+            env=core.Environment(account=environ["AWS_ACCOUNT_ID"], region=environ["AWS_REGION"]))
+        app.synth()
+        duration = time.perf_counter() - start
+
+    return Synth(env=env, environ=environ, templates=read_templates(outdir), duration=duration, outdir=outdir)
+
+
+@pytest.fixture(scope="session")
+def synths(tmp_path_factory) -> Dict[str, Synth]:
+    return {env: synth(env, tmp_path_factory.mktemp(f"cdk.out.{env}")) for env in ENVIRONMENTS}
+
+
+@pytest.fixture(params=ENVIRONMENTS)
+def synthesized(request, synths) -> Synth:
+    return synths[request.param]
+
+
+@pytest.fixture
+def dev(synths) -> Synth:
+    return synths["dev"]
+
+
+@pytest.fixture
+def prod(synths) -> Synth:
+    return synths["prod"]
@@ -0,0 +1,50 @@
+import pytest
+
+from notejam.capacity import CAPACITY_PROFILES, capacity_profile_from_env
+
+
+def test_profiles_are_valid():
+    for profile in CAPACITY_PROFILES.values():
+        profile.validate()
+
+
+def test_default_profile_is_small():
+    assert capacity_profile_from_env({}) == CAPACITY_PROFILES["small"]
+
+
+def test_overrides_are_typed():
+    profile = capacity_profile_from_env({"CAPACITY_PROFILE": "medium", "MAX_CAPACITY": "12", "DB_INSTANCE_TYPE": ""})
+
+    assert profile.max_capacity == 12
+    assert profile.db_instance_type == CAPACITY_PROFILES["medium"].db_instance_type
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match="Unknown CAPACITY_PROFILE 'huge'"):
+        capacity_profile_from_env({"CAPACITY_PROFILE": "huge"})
+
+
+def test_invalid_override_value():
+    with pytest.raises(ValueError, match="Invalid value for TASK_CPU"):
+        capacity_profile_from_env({"TASK_CPU": "one"})
+
+
+@pytest.mark.parametrize("environ, error", [
+    ({"TASK_CPU": "256", "TASK_MEMORY": "4096"}, "not a valid Fargate task size"),
+    ({"REDIS_NUM_CACHE_CLUSTERS": "1"}, "REDIS_NUM_CACHE_CLUSTERS must be at least 2"),
+    ({"MIN_CAPACITY": "4", "DESIRED_CAPACITY": "2"}, "MIN_CAPACITY <= DESIRED_CAPACITY <= MAX_CAPACITY"),
+    ({"NAT_GATEWAYS": "4"}, "NAT_GATEWAYS must be between 1 and 3"),
+    ({"DB_INSTANCE_TYPE": "db.t3.small"}, "DB_INSTANCE_TYPE must look like 't3.small'"),
+])
+def test_invalid_profile(environ, error):
+    with pytest.raises(ValueError, match=error):
+        capacity_profile_from_env(environ)
+
+
+def test_redis_cluster_mode():
+    profile = capacity_profile_from_env({"REDIS_NUM_NODE_GROUPS": "3", "REDIS_NUM_CACHE_CLUSTERS": "1"})
+
+    assert profile.redis_num_node_groups == 3
+
+    with pytest.raises(ValueError, match="REDIS_REPLICAS_PER_NODE_GROUP must be between 1 and 5"):
+        capacity_profile_from_env({"REDIS_NUM_NODE_GROUPS": "3", "REDIS_REPLICAS_PER_NODE_GROUP": "0"})
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tests.conftest import ROOT
+
+SCRIPT = ROOT / "notejam" / "testing" / "mocha-shard.js"
+
+# just enough of mocha for the script: positional specs, --recursive and file lookup
+FAKE_OPTIONS = """
+module.exports.loadOptions = (argv) => ({
+  _: argv.filter((arg, i) => !arg.startsWith('-') && !['--timeout', '--reporter'].includes(argv[i - 1])),
+  extension: ['js'],
+  recursive: argv.includes('--recursive'),
+});
+"""
+FAKE_LOOKUP_FILES = """
+const fs = require('fs');
+const path = require('path');
+module.exports = function lookupFiles(spec, extensions, recursive) {
+  return fs.readdirSync(spec, {withFileTypes: true}).flatMap((entry) => {
+    const file = path.join(spec, entry.name);
+    if (entry.isDirectory()) return recursive ? lookupFiles(file, extensions, recursive) : [];
+    return extensions.includes(path.extname(file).slice(1)) ? [file] : [];
+  });
+};
+"""
+
+
+@pytest.fixture
+def app(tmp_path: Path) -> Path:
+    cli = tmp_path / "node_modules" / "mocha" / "lib" / "cli"
+    cli.mkdir(parents=True)
+    (cli / "options.js").write_text(FAKE_OPTIONS)
+    (cli / "lookup-files.js").write_text(FAKE_LOOKUP_FILES)
+    (tmp_path / "test" / "helpers").mkdir(parents=True)
+    for name in ["a.js", "b.js", "c.js", "helpers/db.js"]:
+        (tmp_path / "test" / name).write_text("")
+    return tmp_path
+
+
+def shard(app: Path, test_script: str, shard: int, shards: int) -> str:
+    (app / "package.json").write_text(json.dumps({"scripts": {"test": test_script}}))
+    return subprocess.run(
+        ["node", str(SCRIPT)], cwd=app, check=True, capture_output=True, text=True,
+        env={**os.environ, "TEST_SHARD": str(shard), "TEST_SHARDS": str(shards)}
+    ).stdout.strip()
+
+
+def test_spec_files_are_split(app):
+    script = "mocha --exit --timeout 5000 --reporter spec test"
+
+    assert shard(app, script, 0, 2) == "--timeout 5000 test/a.js test/c.js"
+    assert shard(app, script, 1, 2) == "--timeout 5000 test/b.js"
+
+
+def test_helpers_are_not_specs(app):
+    assert "helpers" not in shard(app, "mocha test", 0, 1)
+    assert "test/helpers/db.js" in shard(app, "mocha --recursive test", 0, 1)
+
+
+def test_empty_shard_prints_nothing(app):
+    assert shard(app, "mocha test", 3, 4) == ""
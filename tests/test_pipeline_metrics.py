@@ -0,0 +1,70 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from notejam.functions import pipeline_metrics
+
+
+def at(seconds):
+    return datetime(2021, 6, 1, 10, 0, seconds, tzinfo=timezone.utc)
+
+
+class FakeCodePipeline:
+    def list_action_executions(self, pipelineName, filter):
+        return {"actionExecutionDetails": [
+            {"stageName": "Build", "actionName": "Test", "startTime": at(0), "lastUpdateTime": at(40)},
+            # retry
+            {"stageName": "Build", "actionName": "Test", "startTime": at(45), "lastUpdateTime": at(55)},
+            {"stageName": "Build", "actionName": "Build", "startTime": at(0), "lastUpdateTime": at(30)},
+        ]}
+
+    def get_paginator(self, operation):
+        assert operation == "list_pipeline_executions"
+        return self
+
+    def paginate(self, pipelineName):
+        yield {"pipelineExecutionSummaries": [
+            {"pipelineExecutionId": "other", "startTime": at(0), "lastUpdateTime": at(1)},
+        ]}
+        yield {"pipelineExecutionSummaries": [
+            {"pipelineExecutionId": "0123", "startTime": at(0), "lastUpdateTime": at(59)},
+        ]}
+
+
+@pytest.fixture(autouse=True)
+def fake_codepipeline(monkeypatch):
+    monkeypatch.setattr(pipeline_metrics, "codepipeline", FakeCodePipeline)
+
+
+def event(detail_type, **detail):
+    return {
+        "detail-type": detail_type,
+        "time": "2021-06-01T10:01:00Z",
+        "detail": {"pipeline": "notejam-prod", "execution-id": "0123", "state": "SUCCEEDED", **detail}
+    }
+
+
+def emitted(capsys, event):
+    pipeline_metrics.handler(event, None)
+    out = capsys.readouterr().out
+    return json.loads(out) if out else None
+
+
+def test_action_duration(capsys):
+    record = emitted(capsys, event(pipeline_metrics.ACTION_EVENT, stage="Build", action="Test"))
+
+    assert record["ActionDuration"] == 10.0
+    assert record["StageName"] == "Build"
+    assert record["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["PipelineName", "StageName", "ActionName"]]
+
+
+def test_pipeline_duration(capsys):
+    record = emitted(capsys, event("CodePipeline Pipeline Execution State Change"))
+
+    assert record["PipelineDuration"] == 59.0
+    assert record["_aws"]["Timestamp"] == int(datetime(2021, 6, 1, 10, 1).timestamp() * 1000)
+
+
+def test_failed_pipeline_is_skipped(capsys):
+    assert emitted(capsys, event("CodePipeline Pipeline Execution State Change", state="FAILED")) is None
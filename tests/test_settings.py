@@ -0,0 +1,41 @@
+import pytest
+from aws_cdk.aws_logs import RetentionDays
+
+from notejam.settings import from_env, scaling_schedules_from_env
+
+
+def test_values_are_typed():
+    environ = {"INT": "12", "FLOAT": "0.5", "BOOL": "true", "LIST": "a,b", "RETENTION": "ONE_WEEK", "STR": "x"}
+
+    assert from_env("INT", 1, environ) == 12
+    assert from_env("FLOAT", 1.0, environ) == 0.5
+    assert from_env("BOOL", False, environ) is True
+    assert from_env("LIST", ["c"], environ) == ["a", "b"]
+    assert from_env("RETENTION", RetentionDays.ONE_MONTH, environ) == RetentionDays.ONE_WEEK
+    assert from_env("STR", None, environ) == "x"
+
+
+def test_unset_or_empty_is_default():
+    assert from_env("INT", 1, {}) == 1
+    assert from_env("INT", 1, {"INT": ""}) == 1
+    assert from_env("STR", None, {}) is None
+
+
+@pytest.mark.parametrize("value, default", [("one", 1), ("yes", False), ("ONE_DAYS", RetentionDays.ONE_MONTH)])
+def test_invalid_value(value, default):
+    with pytest.raises(ValueError, match=f"Invalid value for VALUE: '{value}'"):
+        from_env("VALUE", default, {"VALUE": value})
+
+
+def test_scaling_schedules():
+    environ = {"SCALING_SCHEDULES": "cron(0 7 ? * MON-FRI *)|4|8;rate(1 day)|1|2;"}
+
+    assert scaling_schedules_from_env(environ) == [("cron(0 7 ? * MON-FRI *)", 4, 8), ("rate(1 day)", 1, 2)]
+    assert scaling_schedules_from_env({}) == []
+
+
+@pytest.mark.parametrize("schedule", ["cron(0 7 ? * MON-FRI *)|4", "rate(1 day)|1|2|3", "|1|2", "rate(1 day)|4|2",
+                                      "rate(1 day)|one|2"])
+def test_invalid_scaling_schedules(schedule):
+    with pytest.raises(ValueError, match="Invalid SCALING_SCHEDULES entry"):
+        scaling_schedules_from_env({"SCALING_SCHEDULES": schedule})
@@ -0,0 +1,59 @@
+"""Synth wall time and template / cloud assembly size, appended to ``.benchmarks/synth.jsonl`` on every run.
+
+Override the output file with ``SYNTH_BENCHMARK_FILE``.
+"""
+
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+from tests.conftest import ROOT
+
+# Budgets: fail well before CloudFormation limits (1 MB template body) or a painfully slow pipeline Synth
+SYNTH_SECONDS_BUDGET = float(os.environ.get("SYNTH_SECONDS_BUDGET", "120"))
+TEMPLATE_BYTES_BUDGET = 1_000_000
+MAX_RESOURCES_PER_STACK = 500
+
+
+def directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def test_synth_benchmark(synthesized):
+    template_sizes = {
+        stack_name: len(json.dumps(template))
+        for stack_name, template in sorted(synthesized.templates.items())
+    }
+    record = {
+        "timestamp": int(time.time()),
+        "revision": git_revision(),
+        "env": synthesized.env,
+        "synth_seconds": round(synthesized.duration, 3),
+        "assembly_bytes": directory_size(synthesized.outdir),
+        "template_bytes": template_sizes,
+        "resources": {
+            stack_name: len(template.get("Resources", {}))
+            for stack_name, template in sorted(synthesized.templates.items())
+        },
+    }
+
+    benchmark_file = Path(os.environ.get("SYNTH_BENCHMARK_FILE", ROOT / ".benchmarks" / "synth.jsonl"))
+    benchmark_file.parent.mkdir(parents=True, exist_ok=True)
+    with benchmark_file.open("a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    assert synthesized.duration < SYNTH_SECONDS_BUDGET
+    for stack_name, size in template_sizes.items():
+        assert size < TEMPLATE_BYTES_BUDGET, stack_name
+    for stack_name, count in record["resources"].items():
+        assert count < MAX_RESOURCES_PER_STACK, stack_name
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from notejam.functions import task_startup_metrics
+
+
+class FakeDynamoDB:
+    class exceptions:
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+    def __init__(self):
+        self.items = {}
+
+    def put_item(self, TableName, Item, ConditionExpression):
+        assert ConditionExpression == "attribute_not_exists(taskArn)"
+        if Item["taskArn"]["S"] in self.items:
+            raise self.exceptions.ConditionalCheckFailedException()
+        self.items[Item["taskArn"]["S"]] = Item
+
+
+@pytest.fixture(autouse=True)
+def fake_dynamodb(monkeypatch):
+    client = FakeDynamoDB()
+    monkeypatch.setattr(task_startup_metrics, "dynamodb", lambda: client)
+    monkeypatch.setenv("TABLE_NAME", "tasks")
+    return client
+
+
+def event(**detail):
+    return {"detail": {
+        "group": "service:notejam-prod-service",
+        "taskArn": "arn:aws:ecs:eu-central-1:123456789012:task/notejam/0123",
+        "createdAt": "2021-06-01T10:00:00.000Z",
+        "pullStartedAt": "2021-06-01T10:00:05.500Z",
+        "pullStoppedAt": "2021-06-01T10:00:20Z",
+        "startedAt": "2021-06-01T10:00:22.000Z",
+        "updatedAt": "2021-06-01T10:00:52.000Z",
+        "healthStatus": "HEALTHY",
+        **detail
+    }}
+
+
+def emitted(capsys, **detail):
+    task_startup_metrics.handler(event(**detail), None)
+    out = capsys.readouterr().out
+    return json.loads(out) if out else None
+
+
+def test_healthy_task(capsys):
+    record = emitted(capsys)
+
+    assert record["ServiceName"] == "notejam-prod-service"
+    assert record["ProvisioningTime"] == 5.5
+    assert record["ImagePullTime"] == 14.5
+    assert record["ContainerStartTime"] == 2.0
+    assert record["TimeToHealthy"] == 30.0
+    assert record["TaskStartupTime"] == 52.0
+    assert [metric["Name"] for metric in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]] == \
+        ["ProvisioningTime", "ImagePullTime", "ContainerStartTime", "TimeToHealthy", "TaskStartupTime"]
+
+
+def test_not_yet_healthy_task_is_skipped(capsys):
+    assert emitted(capsys, healthStatus="UNKNOWN") is None
+
+
+def test_task_is_counted_once(capsys, fake_dynamodb):
+    assert emitted(capsys) is not None
+    # e.g. the collector sidecar exited, or the task went UNHEALTHY and HEALTHY again
+    assert emitted(capsys, updatedAt="2021-06-01T10:05:00.000Z") is None
+    assert list(fake_dynamodb.items) == ["arn:aws:ecs:eu-central-1:123456789012:task/notejam/0123"]
@@ -0,0 +1,557 @@
+"""Performance-critical settings of the synthesized templates (dev & prod)."""
+
+import json
+
+import pytest
+
+from notejam.app_pipeline import LoadTestSettings, load_test_settings_from_env
+from notejam.capacity import capacity_profile_from_env
+from tests.conftest import synth
+
+# Managed policy "Managed-CachingDisabled"
+CACHING_DISABLED_POLICY_ID = "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+
+
+def distribution_config(synthesized):
+    distribution, = synthesized.resources("edge", "AWS::CloudFront::Distribution").values()
+    return distribution["DistributionConfig"]
+
+
+def rule_resource(synthesized, layer):
+    """The (single) events rule of the layer, with its DependsOn."""
+    resource, = [resource for resource in synthesized.template(layer)["Resources"].values()
+                 if resource["Type"] == "AWS::Events::Rule"]
+    return resource
+
+
+def cache_policies(synthesized):
+    return {
+        logical_id: properties["CachePolicyConfig"]
+        for logical_id, properties in synthesized.resources("edge", "AWS::CloudFront::CachePolicy").items()
+    }
+
+
+def test_all_stacks_synthesized(synthesized):
+    env = synthesized.env
+    assert set(synthesized.templates) == {
+        f"notejam-{env}",
+        *(f"notejam-{env}-{layer}" for layer in
+          ["network", "data", "cache", "service", "edge", "monitoring", "app-pipeline"])
+    }
+
+
+# ==========================================================================================
+# CloudFront
+
+def test_pages_are_not_cache_disabled(prod):
+    default_behavior = distribution_config(prod)["DefaultCacheBehavior"]
+
+    assert default_behavior["CachePolicyId"] != CACHING_DISABLED_POLICY_ID
+    assert "Ref" in default_behavior["CachePolicyId"]
+
+
+def test_cache_policies_are_valid(synthesized):
+    # CloudFront rejects cache key and compression settings on a policy that caches nothing
+    for policy in cache_policies(synthesized).values():
+        parameters = policy["ParametersInCacheKeyAndForwardedToOrigin"]
+        if policy["MaxTTL"] == 0:
+            assert parameters["CookiesConfig"]["CookieBehavior"] == "none"
+            assert parameters["HeadersConfig"]["HeaderBehavior"] == "none"
+            assert parameters["QueryStringsConfig"]["QueryStringBehavior"] == "none"
+            assert parameters["EnableAcceptEncodingGzip"] is False
+            assert parameters["EnableAcceptEncodingBrotli"] is False
+
+
+def test_uncached_pages_use_caching_disabled(dev):
+    assert dev.environ["CF_PAGE_MAX_TTL"] == "0"
+    assert distribution_config(dev)["DefaultCacheBehavior"]["CachePolicyId"] == CACHING_DISABLED_POLICY_ID
+
+
+def test_responses_are_compressed(synthesized):
+    config = distribution_config(synthesized)
+
+    for behavior in [config["DefaultCacheBehavior"], *config["CacheBehaviors"]]:
+        assert behavior["Compress"] is True
+
+
+def test_static_assets_are_cached(synthesized):
+    config = distribution_config(synthesized)
+    policies = cache_policies(synthesized)
+    behaviors = {behavior["PathPattern"]: behavior for behavior in config["CacheBehaviors"]}
+
+    assert {"*.css", "*.js"} <= set(behaviors)
+    for pattern in synthesized.environ["CF_STATIC_PATH_PATTERNS"].split(","):
+        policy = policies[behaviors[pattern]["CachePolicyId"]["Ref"]]
+        parameters = policy["ParametersInCacheKeyAndForwardedToOrigin"]
+
+        assert policy["DefaultTTL"] == int(synthesized.environ["CF_STATIC_DEFAULT_TTL"]) > 0
+        assert parameters["CookiesConfig"]["CookieBehavior"] == "none"
+        assert parameters["HeadersConfig"]["HeaderBehavior"] == "none"
+        assert parameters["EnableAcceptEncodingGzip"] is True
+        assert parameters["EnableAcceptEncodingBrotli"] is True
+
+
+def test_pages_are_keyed_by_session(prod):
+    policy_id = distribution_config(prod)["DefaultCacheBehavior"]["CachePolicyId"]["Ref"]
+    cookies = cache_policies(prod)[policy_id]["ParametersInCacheKeyAndForwardedToOrigin"]["CookiesConfig"]
+
+    assert cookies == {"CookieBehavior": "whitelist", "Cookies": ["connect.sid"]}
+
+
+# ==========================================================================================
+# ECS
+
+def test_task_size(synthesized):
+    capacity = capacity_profile_from_env(synthesized.environ)
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+
+    assert task_definition["Cpu"] == str(capacity.task_cpu)
+    assert task_definition["Memory"] == str(capacity.task_memory)
+    assert task_definition["RuntimePlatform"]["CpuArchitecture"] == synthesized.environ["CPU_ARCHITECTURE"]
+    assert task_definition["ContainerDefinitions"][0]["MemoryReservation"] == capacity.container_memory_reservation
+
+
+def test_service_scaling(synthesized):
+    capacity = capacity_profile_from_env(synthesized.environ)
+    targets = synthesized.resources("service", "AWS::ApplicationAutoScaling::ScalableTarget").values()
+    target, = [target for target in targets if target["ScalableDimension"] == "ecs:service:DesiredCount"]
+
+    assert target["MinCapacity"] == capacity.min_capacity
+    assert target["MaxCapacity"] == capacity.max_capacity
+    assert len(target.get("ScheduledActions", [])) == len(list(filter(None, synthesized.environ["SCALING_SCHEDULES"].split(";"))))
+
+    policies = synthesized.resources("service", "AWS::ApplicationAutoScaling::ScalingPolicy").values()
+    predefined_metrics = {
+        policy["TargetTrackingScalingPolicyConfiguration"]["PredefinedMetricSpecification"]["PredefinedMetricType"]
+        for policy in policies if policy["PolicyType"] == "TargetTrackingScaling"
+    }
+
+    assert predefined_metrics == {"ECSServiceAverageCPUUtilization", "ALBRequestCountPerTarget"}
+    step_policy, = [policy for policy in policies if policy["PolicyType"] == "StepScaling"]
+    # scale out only, scale in is left to target tracking
+    assert all(step["ScalingAdjustment"] > 0
+               for step in step_policy["StepScalingPolicyConfiguration"]["StepAdjustments"])
+
+
+def test_prod_has_scheduled_scaling(prod):
+    target, = [target for target in prod.resources("service", "AWS::ApplicationAutoScaling::ScalableTarget").values()
+               if target["ScalableDimension"] == "ecs:service:DesiredCount"]
+
+    assert len(target["ScheduledActions"]) == 2
+
+
+def test_fargate_spot(dev):
+    service, = dev.resources("service", "AWS::ECS::Service").values()
+    strategy = {item["CapacityProvider"]: item for item in service["CapacityProviderStrategy"]}
+
+    assert strategy["FARGATE_SPOT"]["Weight"] == int(dev.environ["FARGATE_SPOT_WEIGHT"]) > 0
+    assert strategy["FARGATE"].get("Base", 0) == int(dev.environ["FARGATE_BASE"])
+
+
+def test_no_fargate_spot_on_arm64(tmp_path):
+    with pytest.raises(ValueError, match="ARM64"):
+        synth("dev", tmp_path, CPU_ARCHITECTURE="ARM64", FARGATE_SPOT_WEIGHT="1")
+
+
+# ==========================================================================================
+# Aurora & Redis
+
+def test_image_is_built_for_the_task_architecture(dev, prod):
+    def build_spec(synthesized):
+        return json.dumps([project["Source"]["BuildSpec"]
+                           for project in synthesized.resources("app-pipeline", "AWS::CodeBuild::Project").values()
+                           if "docker buildx build" in json.dumps(project["Source"]["BuildSpec"])])
+
+    assert "--platform linux/amd64 " in build_spec(dev)
+    assert "binfmt" not in build_spec(dev)
+    assert "--platform linux/arm64 " in build_spec(prod)
+
+
+def test_image_layers_are_cached_in_ecr(synthesized):
+    build_project, = [project for project in synthesized.resources("app-pipeline", "AWS::CodeBuild::Project").values()
+                      if "docker buildx build" in json.dumps(project["Source"]["BuildSpec"])]
+
+    assert "--cache-to type=registry" in json.dumps(build_project["Source"]["BuildSpec"])
+    # the buildx builder doesn't use the docker layer cache of the host
+    assert build_project["Cache"] == {"Type": "LOCAL", "Modes": ["LOCAL_CUSTOM_CACHE"]}
+
+
+def test_no_fargate_strategy_without_spot(tmp_path):
+    with pytest.raises(ValueError, match="FARGATE_BASE and FARGATE_WEIGHT"):
+        synth("prod", tmp_path, FARGATE_BASE="2")
+
+
+def test_instance_classes(synthesized):
+    capacity = capacity_profile_from_env(synthesized.environ)
+    instances = synthesized.resources("data", "AWS::RDS::DBInstance").values()
+    redis, = synthesized.resources("cache", "AWS::ElastiCache::ReplicationGroup").values()
+
+    assert len(instances) == capacity.db_instances
+    assert {instance["DBInstanceClass"] for instance in instances} == {f"db.{capacity.db_instance_type}"}
+    assert redis["CacheNodeType"] == capacity.redis_node_type
+    assert redis.get("NumCacheClusters") == capacity.redis_num_cache_clusters
+
+
+def test_expected_instance_classes(dev, prod):
+    for synthesized, db_instance_class in [(dev, "db.t3.small"), (prod, "db.t3.medium")]:
+        instances = synthesized.resources("data", "AWS::RDS::DBInstance").values()
+        assert {instance["DBInstanceClass"] for instance in instances} == {db_instance_class}
+
+
+def test_db_replica_scaling(synthesized):
+    policies = synthesized.resources("data", "AWS::ApplicationAutoScaling::ScalingPolicy").values()
+    predefined_metrics = {
+        policy["TargetTrackingScalingPolicyConfiguration"]["PredefinedMetricSpecification"]["PredefinedMetricType"]
+        for policy in policies
+    }
+
+    assert predefined_metrics == {"RDSReaderAverageCPUUtilization", "RDSReaderAverageDatabaseConnections"}
+
+
+def test_prod_connects_through_rds_proxy(prod):
+    target_group, = prod.resources("data", "AWS::RDS::DBProxyTargetGroup").values()
+    pool = target_group["ConnectionPoolConfigurationInfo"]
+    task_definition, = prod.resources("service", "AWS::ECS::TaskDefinition").values()
+    environment = {item["Name"]: item["Value"] for item in task_definition["ContainerDefinitions"][0]["Environment"]}
+
+    assert pool["MaxConnectionsPercent"] == int(prod.environ["DB_PROXY_MAX_CONNECTIONS_PERCENT"])
+    assert pool["MaxIdleConnectionsPercent"] == int(prod.environ["DB_PROXY_MAX_IDLE_CONNECTIONS_PERCENT"])
+    assert "Fn::ImportValue" in environment["DB_HOST"]
+    assert "Fn::ImportValue" in environment["DB_READ_HOST"]
+
+
+def test_dev_connects_to_the_cluster(dev):
+    task_definition, = dev.resources("service", "AWS::ECS::TaskDefinition").values()
+    secrets = {item["Name"] for item in task_definition["ContainerDefinitions"][0]["Secrets"]}
+
+    assert not dev.resources("data", "AWS::RDS::DBProxy")
+    assert "DB_HOST" in secrets
+
+
+# ==========================================================================================
+# Network
+
+def test_nat_gateway_per_az(synthesized):
+    assert len(synthesized.resources("network", "AWS::EC2::NatGateway")) == 3
+
+
+def test_vpc_endpoints(dev, prod):
+    services = {
+        properties["ServiceName"] if isinstance(properties["ServiceName"], str) else "s3"
+        for properties in prod.resources("network", "AWS::EC2::VPCEndpoint").values()
+    }
+
+    assert not dev.resources("network", "AWS::EC2::VPCEndpoint")
+    assert services == {"s3", *(f"com.amazonaws.eu-central-1.{service}"
+                                for service in ["ecr.api", "ecr.dkr", "logs", "secretsmanager", "xray"])}
+
+
+def test_fargate_egress_goes_through_endpoints(prod):
+    security_groups = prod.resources("network", "AWS::EC2::SecurityGroup")
+    fargate_id, = [logical_id for logical_id, properties in security_groups.items()
+                   if properties["GroupDescription"] == "Fargate Security Group"]
+    egress = [properties for properties in prod.resources("network", "AWS::EC2::SecurityGroupEgress").values()
+              if properties["GroupId"]["Fn::GetAtt"][0] == fargate_id]
+    inline = security_groups[fargate_id].get("SecurityGroupEgress", [])
+
+    # 443 to the endpoints and to the S3 prefix list of the region, none to the internet
+    assert sorted(rule.get("DestinationPrefixListId", "endpoints") for rule in egress) == \
+        ["endpoints", prod.environ["S3_PREFIX_LIST_ID"]]
+    assert [rule["FromPort"] for rule in egress] == [443, 443]
+    assert not any(rule.get("CidrIp") == "0.0.0.0/0" for rule in [*egress, *inline])
+
+
+# ==========================================================================================
+# Load Balancer
+
+def test_load_balancer_tuning(synthesized):
+    environ = synthesized.environ
+    load_balancer, = synthesized.resources("service", "AWS::ElasticLoadBalancingV2::LoadBalancer").values()
+    target_group, = synthesized.resources("service", "AWS::ElasticLoadBalancingV2::TargetGroup").values()
+    lb_attributes = {item["Key"]: item["Value"] for item in load_balancer["LoadBalancerAttributes"]}
+    tg_attributes = {item["Key"]: item["Value"] for item in target_group["TargetGroupAttributes"]}
+
+    assert lb_attributes["idle_timeout.timeout_seconds"] == environ["LB_IDLE_TIMEOUT"]
+    assert tg_attributes["load_balancing.algorithm.type"] == environ["LB_ALGORITHM"]
+    assert tg_attributes.get("slow_start.duration_seconds", "0") == environ["LB_SLOW_START"]
+    assert target_group["HealthCheckPath"] == environ["HEALTH_CHECK_PATH"]
+    assert target_group["HealthCheckIntervalSeconds"] == int(environ["HEALTH_CHECK_INTERVAL"])
+
+
+def test_origin_timeouts(synthesized):
+    origin, = distribution_config(synthesized)["Origins"]
+    custom_origin = origin["CustomOriginConfig"]
+
+    assert custom_origin["OriginKeepaliveTimeout"] == int(synthesized.environ["CF_ORIGIN_KEEPALIVE_TIMEOUT"])
+    assert custom_origin["OriginReadTimeout"] == int(synthesized.environ["CF_ORIGIN_READ_TIMEOUT"])
+    assert custom_origin["OriginKeepaliveTimeout"] < int(synthesized.environ["LB_IDLE_TIMEOUT"])
+
+
+def test_slow_query_log(synthesized):
+    cluster, = synthesized.resources("data", "AWS::RDS::DBCluster").values()
+    cluster_parameters, = synthesized.resources("data", "AWS::RDS::DBClusterParameterGroup").values()
+
+    assert "slowquery" in cluster["EnableCloudwatchLogsExports"]
+    assert cluster_parameters["Parameters"]["slow_query_log"] == "1"
+    assert float(cluster_parameters["Parameters"]["long_query_time"]) == float(synthesized.environ["DB_LONG_QUERY_TIME"])
+    assert synthesized.resources("data", "Custom::LogRetention")
+
+
+def test_db_monitoring(dev, prod):
+    for synthesized in (dev, prod):
+        enabled = synthesized.environ["DB_PERFORMANCE_INSIGHTS"] == "true"
+        instance_parameters, = synthesized.resources("data", "AWS::RDS::DBParameterGroup").values()
+
+        assert instance_parameters["Parameters"]["performance_schema"] == ("1" if enabled else "0")
+        for instance in synthesized.resources("data", "AWS::RDS::DBInstance").values():
+            assert instance.get("EnablePerformanceInsights", False) is enabled
+            assert instance.get("MonitoringInterval", 0) == int(synthesized.environ["DB_MONITORING_INTERVAL"])
+
+
+def test_redis_parameter_group(synthesized):
+    redis, = synthesized.resources("cache", "AWS::ElastiCache::ReplicationGroup").values()
+    parameter_group, = synthesized.resources("cache", "AWS::ElastiCache::ParameterGroup").values()
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+    environment = {item["Name"] for item in task_definition["ContainerDefinitions"][0]["Environment"]}
+
+    assert "Ref" in redis["CacheParameterGroupName"]
+    assert parameter_group["Properties"]["maxmemory-policy"] == synthesized.environ["REDIS_MAXMEMORY_POLICY"]
+    assert parameter_group["Properties"]["cluster-enabled"] == "no"
+    assert {"REDIS_HOST", "REDIS_READ_HOST"} <= environment
+
+
+def test_redis_cluster_mode(tmp_path):
+    synthesized = synth("dev", tmp_path, REDIS_NUM_NODE_GROUPS="2", REDIS_REPLICAS_PER_NODE_GROUP="2")
+    redis, = synthesized.resources("cache", "AWS::ElastiCache::ReplicationGroup").values()
+    parameter_group, = synthesized.resources("cache", "AWS::ElastiCache::ParameterGroup").values()
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+    environment = {item["Name"]: item["Value"] for item in task_definition["ContainerDefinitions"][0]["Environment"]}
+    cpu_alarms = [alarm for alarm in synthesized.resources("monitoring", "AWS::CloudWatch::Alarm").values()
+                  if alarm["AlarmDescription"] == "Redis Engine CPU (%)"]
+
+    assert redis["NumNodeGroups"] == 2
+    assert redis["ReplicasPerNodeGroup"] == 2
+    assert "NumCacheClusters" not in redis
+    assert parameter_group["Properties"]["cluster-enabled"] == "yes"
+    assert environment["REDIS_CLUSTER_MODE"] == "true"
+    assert "REDIS_READ_HOST" not in environment
+    assert len(cpu_alarms) == 6
+
+
+def test_stateful_resources_survive_a_stack_removal(synthesized):
+    resources = {**synthesized.template("data")["Resources"], **synthesized.template("service")["Resources"]}
+    policies = {resource["Type"]: resource.get("DeletionPolicy") for resource in resources.values()}
+
+    assert policies["AWS::RDS::DBCluster"] == "Snapshot"
+    assert policies["AWS::ECR::Repository"] == "Retain"
+    assert policies["AWS::Logs::LogGroup"] == "Retain"
+
+
+def test_migration_from_single_stack(tmp_path):
+    synthesized = synth("prod", tmp_path, DB_SNAPSHOT_IDENTIFIER="notejam-prod-cutover",
+                        REDIS_SNAPSHOT_NAME="notejam-prod-cutover", ECR_REPOSITORY_NAME="notejam-prod-ecrrepo")
+    cluster, = synthesized.resources("data", "AWS::RDS::DBCluster").values()
+    proxy, = synthesized.resources("data", "AWS::RDS::DBProxy").values()
+    redis, = synthesized.resources("cache", "AWS::ElastiCache::ReplicationGroup").values()
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+
+    assert cluster["SnapshotIdentifier"] == "notejam-prod-cutover"
+    assert "MasterUsername" not in cluster
+    # new master password, from the secret attached to the cluster (read by the app and the proxy)
+    assert "resolve:secretsmanager" in json.dumps(cluster["MasterUserPassword"])
+    assert proxy["Auth"][0]["SecretArn"] == {"Ref": "AuroraSecretAttachmentEAAB0558"}
+    assert redis["SnapshotName"] == "notejam-prod-cutover"
+    assert synthesized.resources("service", "AWS::ECR::Repository") == {}
+    assert "notejam-prod-ecrrepo:latest" in json.dumps(task_definition["ContainerDefinitions"][0]["Image"])
+
+
+def test_logging_never_blocks(synthesized):
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+    log_group, = synthesized.resources("service", "AWS::Logs::LogGroup").values()
+    log_configurations = {
+        container["Name"]: container["LogConfiguration"] for container in task_definition["ContainerDefinitions"]
+    }
+    awslogs = [config["Options"] for config in log_configurations.values() if config["LogDriver"] == "awslogs"]
+
+    assert log_group["RetentionInDays"] > 0
+    assert awslogs
+    for options in awslogs:
+        assert options["mode"] == "non-blocking"
+        assert options["max-buffer-size"] == synthesized.environ["LOG_MAX_BUFFER_SIZE"]
+
+    if synthesized.environ["LOG_DRIVER"] == "firelens":
+        assert log_configurations["notejam"]["LogDriver"] == "awsfirelens"
+        assert "LogRouter" in log_configurations
+    else:
+        assert log_configurations["notejam"]["LogDriver"] == "awslogs"
+        assert "LogRouter" not in log_configurations
+
+
+def test_startup_metrics_function(synthesized):
+    function, = synthesized.resources("monitoring", "AWS::Lambda::Function").values()
+    log_group, = synthesized.resources("monitoring", "AWS::Logs::LogGroup").values()
+    rule, = synthesized.resources("monitoring", "AWS::Events::Rule").values()
+    table, = synthesized.resources("monitoring", "AWS::DynamoDB::Table").values()
+
+    assert rule_resource(synthesized, "monitoring")["DependsOn"] == \
+        list(synthesized.resources("monitoring", "AWS::Logs::LogGroup"))
+    # startup phases once per task: on its first HEALTHY event, the table remembers the tasks already counted
+    assert rule["EventPattern"]["detail"]["healthStatus"] == ["HEALTHY"]
+    assert table["TimeToLiveSpecification"] == {"AttributeName": "expiresAt", "Enabled": True}
+    assert "TABLE_NAME" in function["Environment"]["Variables"]
+    assert function["Runtime"] == "python3.12"
+    assert log_group["RetentionInDays"] > 0
+    assert json.dumps(log_group["LogGroupName"]).startswith('{"Fn::Join": ["", ["/aws/lambda/"')
+
+
+# ==========================================================================================
+# Tracing
+
+def test_tracing(synthesized):
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+    containers = {container["Name"]: container for container in task_definition["ContainerDefinitions"]}
+    environment = {item["Name"]: item["Value"] for item in containers["notejam"]["Environment"]}
+    collector_environment = {item["Name"]: item["Value"] for item in containers["otel-collector"]["Environment"]}
+    roles = synthesized.resources("service", "AWS::IAM::Role").values()
+    origin_request_policy, = synthesized.resources("edge", "AWS::CloudFront::OriginRequestPolicy").values()
+    headers = origin_request_policy["OriginRequestPolicyConfig"]["HeadersConfig"]["Headers"]
+
+    assert containers["otel-collector"]["Essential"] is False
+    assert "awsxray" in collector_environment["AOT_CONFIG_CONTENT"]
+    assert environment["OTEL_EXPORTER_OTLP_ENDPOINT"] == "http://localhost:4317"
+    assert environment["AWS_XRAY_DAEMON_ADDRESS"] == "localhost:2000"
+    assert any("AWSXRayDaemonWriteAccess" in json.dumps(role.get("ManagedPolicyArns", [])) for role in roles)
+    assert {"X-Amzn-Trace-Id", "traceparent"} <= set(headers)
+
+
+def test_prod_collector_image_is_private(prod):
+    task_definition, = prod.resources("service", "AWS::ECS::TaskDefinition").values()
+    containers = {container["Name"]: container for container in task_definition["ContainerDefinitions"]}
+    policies = json.dumps(prod.resources("service", "AWS::IAM::Policy"))
+
+    # no route to public.ecr.aws from the prod tasks (endpoints + S3 prefix list only)
+    assert ".dkr.ecr.eu-central-1.amazonaws.com/aws-otel-collector:" in containers["otel-collector"]["Image"]
+    assert "arn:aws:ecr:eu-central-1:817159430378:repository/aws-otel-collector" in policies
+
+
+def test_public_collector_image_is_rejected_without_internet_egress(tmp_path):
+    with pytest.raises(ValueError, match="TRACING_COLLECTOR_IMAGE .* can't be pulled"):
+        synth("prod", tmp_path, TRACING_COLLECTOR_IMAGE="public.ecr.aws/aws-observability/aws-otel-collector:v0.11.0")
+
+
+def test_collector_image_defaults_to_a_private_copy_without_internet_egress(tmp_path):
+    synthesized = synth("prod", tmp_path, TRACING_COLLECTOR_IMAGE="")
+    task_definition, = synthesized.resources("service", "AWS::ECS::TaskDefinition").values()
+    containers = {container["Name"]: container for container in task_definition["ContainerDefinitions"]}
+
+    assert containers["otel-collector"]["Image"] == \
+        "817159430378.dkr.ecr.eu-central-1.amazonaws.com/aws-otel-collector:v0.11.0"
+
+
+def test_tracing_in_test_stage(synthesized):
+    # the build spec references the ECR repo, so it is rendered as a Fn::Join
+    build_spec, = [json.dumps(project["Source"]["BuildSpec"])
+                   for logical_id, project in synthesized.resources("app-pipeline", "AWS::CodeBuild::Project").items()
+                   if logical_id.startswith("NotejamTest")]
+
+    assert "AOT_CONFIG_CONTENT" in build_spec
+    assert "docker run -d --name otel-collector" in build_spec
+    assert "OTEL_EXPORTER_OTLP_ENDPOINT=http://otel-collector:4317" in build_spec
+
+
+def test_load_test_stage(synthesized):
+    pipeline, = synthesized.resources("app-pipeline", "AWS::CodePipeline::Pipeline").values()
+    build_spec, = [json.dumps(project["Source"]["BuildSpec"])
+                   for logical_id, project in synthesized.resources("app-pipeline", "AWS::CodeBuild::Project").items()
+                   if logical_id.startswith("NotejamLoadTest")]
+    settings = load_test_settings_from_env(synthesized.environ)
+    stages = {stage["Name"]: stage["Actions"] for stage in pipeline["Stages"]}
+    load_test_action, = stages["LoadTest"]
+    deploy_actions = [action["Name"] for action in sorted(stages["Deploy"], key=lambda action: action["RunOrder"])]
+
+    assert list(stages)[-2:] == ["Deploy", "LoadTest"]
+    assert "grafana/k6" in build_spec
+    assert f'\\"P95_MS\\": \\"{settings.p95_ms}\\"' in build_spec
+    # credentials from the load test secret
+    assert '\\"secrets-manager\\"' in build_spec and ":password" in build_spec
+    assert "loadtest-password" not in build_spec
+    # rollback to the task definition recorded before the deployment, not the previous revision number
+    assert ("update-service" in build_spec) is settings.rollback
+    if settings.rollback:
+        assert "--task-definition $PREVIOUS_TASK_DEFINITION" in build_spec
+        assert deploy_actions == ["PreDeploy", "DeployAction"]
+        assert json.loads(load_test_action["Configuration"]["EnvironmentVariables"]) == [
+            {"name": "PREVIOUS_TASK_DEFINITION", "type": "PLAINTEXT", "value": "#{PreDeploy.TASK_DEFINITION}"}
+        ]
+    else:
+        assert deploy_actions == ["DeployAction"]
+
+
+def test_latest_is_moved_after_the_load_test(synthesized):
+    build_spec = json.dumps(synthesized.resources("app-pipeline", "AWS::CodeBuild::Project"))
+    settings = load_test_settings_from_env(synthesized.environ)
+    rollback = settings.enabled and settings.rollback
+
+    # latest is the image of the CDK task definition revision, which the rollback may go back to
+    assert ("-t $DOCKER_LATEST" in build_spec) is not rollback
+    assert ("--image-tag latest" in build_spec) is rollback
+
+
+def test_load_test_settings_from_env():
+    assert load_test_settings_from_env({}) == LoadTestSettings()
+    assert load_test_settings_from_env({"LOAD_TEST_P99_MS": "900", "LOAD_TEST_ROLLBACK": "false"}) == \
+        LoadTestSettings(p99_ms=900, rollback=False)
+    with pytest.raises(ValueError):
+        load_test_settings_from_env({"LOAD_TEST_VUS": "many"})
+
+
+def test_cdk_pipeline_synth(synthesized):
+    projects = synthesized.resources(None, "AWS::CodeBuild::Project")
+    synth_project, = [project for logical_id, project in projects.items() if logical_id.startswith("Synth")]
+    build_spec = json.loads(synth_project["Source"]["BuildSpec"])
+
+    assert synth_project["Cache"] == {"Type": "LOCAL", "Modes": ["LOCAL_CUSTOM_CACHE"]}
+    assert {"/root/.npm/**/*", "/root/.cache/pip/**/*"} <= set(build_spec["cache"]["paths"])
+    # CLI pinned for the synth, the self mutation and the asset publishing
+    install_commands = [json.loads(project["Source"]["BuildSpec"])["phases"]["install"]["commands"]
+                        for project in projects.values()]
+    assert all("@1.106.1" in json.dumps(commands) for commands in install_commands)
+
+
+def test_app_pipeline_dag(synthesized):
+    pipeline, = synthesized.resources("app-pipeline", "AWS::CodePipeline::Pipeline").values()
+    stages = {stage["Name"]: stage["Actions"] for stage in pipeline["Stages"]}
+    rules = synthesized.resources("app-pipeline", "AWS::Events::Rule").values()
+
+    assert list(stages)[:3] == ["Source", "Build", "Deploy"]
+    assert {action["Name"]: action["RunOrder"] for action in stages["Build"]} == \
+        {"Build": 1, "Test": 1, "DbMigrations": 1}
+    assert any("CodePipeline Action Execution State Change" in rule["EventPattern"]["detail-type"] for rule in rules)
+
+
+def test_image_wait_stops_when_build_fails(synthesized):
+    pipeline, = synthesized.resources("app-pipeline", "AWS::CodePipeline::Pipeline").values()
+    build_actions = {action["Name"]: action for action in pipeline["Stages"][1]["Actions"]}
+    projects = synthesized.resources("app-pipeline", "AWS::CodeBuild::Project")
+
+    for action in build_actions.values():
+        environment = json.loads(action["Configuration"]["EnvironmentVariables"])
+        assert {"name": "PIPELINE_EXECUTION_ID", "type": "PLAINTEXT",
+                "value": "#{codepipeline.PipelineExecutionId}"} in environment
+    for name in ["Test", "DbMigrations"]:
+        project = projects[build_actions[name]["Configuration"]["ProjectName"]["Ref"]]
+        build_spec = json.dumps(project["Source"]["BuildSpec"])
+        assert "codebuild batch-get-builds" in build_spec
+        assert "FAILED|FAULT|TIMED_OUT|STOPPED" in build_spec
+        # the Build project, not the pipeline (which depends on the projects)
+        assert json.dumps({"Ref": build_actions["Build"]["Configuration"]["ProjectName"]["Ref"]}) in build_spec
+
+
+def test_pipeline_metrics_function(synthesized):
+    function, = synthesized.resources("app-pipeline", "AWS::Lambda::Function").values()
+    log_group, = synthesized.resources("app-pipeline", "AWS::Logs::LogGroup").values()
+
+    assert rule_resource(synthesized, "app-pipeline")["DependsOn"] == \
+        list(synthesized.resources("app-pipeline", "AWS::Logs::LogGroup"))
+    assert function["Runtime"] == "python3.12"
+    assert log_group["RetentionInDays"] > 0